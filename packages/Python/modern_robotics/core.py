@@ -19,6 +19,9 @@ Optional library: matplotlib
 *** IMPORTS ***
 '''
 
+import time
+import warnings
+
 import numpy as np
 
 '''
@@ -89,6 +92,34 @@ def VecToso3(omg):
                      [omg[2],       0, -omg[0]],
                      [-omg[1], omg[0],       0]])
 
+def VecToso3Batch(omgs):
+    """Converts a stack of 3-vectors to so(3) representations
+
+    :param omgs: An array of 3-vectors with shape (..., 3)
+    :return: The skew symmetric representations of omgs, with shape
+             (..., 3, 3)
+
+    Example Input:
+        omgs = np.array([[1, 2, 3],
+                         [0, 0, 1]])
+    Output:
+        np.array([[[ 0, -3,  2],
+                   [ 3,  0, -1],
+                   [-2,  1,  0]],
+                  [[ 0, -1,  0],
+                   [ 1,  0,  0],
+                   [ 0,  0,  0]]])
+    """
+    omgs = np.asarray(omgs)
+    so3mats = np.zeros(omgs.shape[:-1] + (3, 3), dtype=omgs.dtype)
+    so3mats[..., 0, 1] = -omgs[..., 2]
+    so3mats[..., 0, 2] = omgs[..., 1]
+    so3mats[..., 1, 0] = omgs[..., 2]
+    so3mats[..., 1, 2] = -omgs[..., 0]
+    so3mats[..., 2, 0] = -omgs[..., 1]
+    so3mats[..., 2, 1] = omgs[..., 0]
+    return so3mats
+
 def so3ToVec(so3mat):
     """Converts an so(3) representation to a 3-vector
 
@@ -104,6 +135,28 @@ def so3ToVec(so3mat):
     """
     return np.array([so3mat[2][1], so3mat[0][2], so3mat[1][0]])
 
+def so3ToVecBatch(so3mats):
+    """Converts a stack of so(3) representations to 3-vectors
+
+    :param so3mats: An array of 3x3 skew-symmetric matrices with shape
+                    (..., 3, 3)
+    :return: The 3-vectors corresponding to so3mats, with shape (..., 3)
+
+    Example Input:
+        so3mats = np.array([[[ 0, -3,  2],
+                             [ 3,  0, -1],
+                             [-2,  1,  0]],
+                            [[ 0, -1,  0],
+                             [ 1,  0,  0],
+                             [ 0,  0,  0]]])
+    Output:
+        np.array([[1, 2, 3],
+                  [0, 0, 1]])
+    """
+    so3mats = np.asarray(so3mats)
+    return np.stack([so3mats[..., 2, 1], so3mats[..., 0, 2],
+                     so3mats[..., 1, 0]], axis=-1)
+
 def AxisAng3(expc3):
     """Converts a 3-vector of exponential coordinates for rotation into
     axis-angle form
@@ -143,6 +196,42 @@ def MatrixExp3(so3mat):
         return np.eye(3) + np.sin(theta) * omgmat \
                + (1 - np.cos(theta)) * np.dot(omgmat, omgmat)
 
+def MatrixExp3Batch(so3mats):
+    """Computes the matrix exponentials of a stack of so(3) elements
+
+    :param so3mats: Either an array of 3x3 skew-symmetric matrices with shape
+                    (..., 3, 3) or an array of exponential coordinates for
+                    rotation with shape (..., 3). An input whose last two
+                    dimensions are (3, 3) is always treated as matrices
+    :return: The matrix exponentials, with shape (..., 3, 3)
+    Evaluates the same Rodrigues formula as MatrixExp3 for every element in
+    one vectorized pass. Elements whose rotation angle is near zero are
+    returned as the identity, as in MatrixExp3.
+
+    Example Input:
+        so3mats = np.array([[1, 2, 3],
+                            [0, 0, 0]])
+    Output:
+        np.array([[[-0.69492056,  0.71352099,  0.08929286],
+                   [-0.19200697, -0.30378504,  0.93319235],
+                   [ 0.69297817,  0.6313497 ,  0.34810748]],
+                  [[ 1.        ,  0.        ,  0.        ],
+                   [ 0.        ,  1.        ,  0.        ],
+                   [ 0.        ,  0.        ,  1.        ]]])
+    """
+    so3mats = np.asarray(so3mats, dtype=float)
+    if so3mats.shape[-2:] == (3, 3):
+        omgthetas = so3ToVecBatch(so3mats)
+    else:
+        omgthetas = so3mats
+    theta = np.linalg.norm(omgthetas, axis=-1)
+    nearzero = NearZero(theta)
+    theta = np.where(nearzero, 1.0, theta)[..., None, None]
+    omgmat = VecToso3Batch(omgthetas) / theta
+    R = np.eye(3) + np.sin(theta) * omgmat \
+        + (1 - np.cos(theta)) * np.matmul(omgmat, omgmat)
+    return np.where(nearzero[..., None, None], np.eye(3), R)
+
 def MatrixLog3(R):
     """Computes the matrix logarithm of a rotation matrix
 
@@ -176,6 +265,47 @@ def MatrixLog3(R):
         theta = np.arccos(acosinput)
         return theta / 2.0 / np.sin(theta) * (R - np.array(R).T)
 
+def MatrixLog3Batch(Rs):
+    """Computes the matrix logarithms of a stack of rotation matrices
+
+    :param Rs: An array of 3x3 rotation matrices with shape (..., 3, 3)
+    :return: The exponential coordinates omghat*theta of the matrix
+             logarithms of Rs, with shape (..., 3)
+    Follows the same identity, theta = pi and generic branches as MatrixLog3,
+    selected per element with masks instead of Python control flow. The
+    results are returned as 3-vectors; VecToso3Batch recovers the so(3)
+    matrices.
+
+    Example Input:
+        Rs = np.array([[[0, 0, 1],
+                        [1, 0, 0],
+                        [0, 1, 0]],
+                       [[1, 0, 0],
+                        [0, -1, 0],
+                        [0, 0, -1]]])
+    Output:
+        np.array([[1.20919958, 1.20919958, 1.20919958],
+                  [3.14159265,          0,          0]])
+    """
+    Rs = np.asarray(Rs, dtype=float)
+    acosinput = (np.trace(Rs, axis1=-2, axis2=-1) - 1) / 2.0
+    theta = np.arccos(np.clip(acosinput, -1, 1))
+    sintheta = np.where(acosinput >= 1, 1.0, np.sin(theta))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        omg = (theta / 2.0 / sintheta)[..., None] \
+              * so3ToVecBatch(Rs - np.swapaxes(Rs, -1, -2))
+        omg2 = np.stack([Rs[..., 0, 2], Rs[..., 1, 2], 1 + Rs[..., 2, 2]],
+                        axis=-1) / np.sqrt(2 * (1 + Rs[..., 2, 2]))[..., None]
+        omg1 = np.stack([Rs[..., 0, 1], 1 + Rs[..., 1, 1], Rs[..., 2, 1]],
+                        axis=-1) / np.sqrt(2 * (1 + Rs[..., 1, 1]))[..., None]
+        omg0 = np.stack([1 + Rs[..., 0, 0], Rs[..., 1, 0], Rs[..., 2, 0]],
+                        axis=-1) / np.sqrt(2 * (1 + Rs[..., 0, 0]))[..., None]
+    omgpi = np.where(~NearZero(1 + Rs[..., 2, 2])[..., None], omg2,
+                     np.where(~NearZero(1 + Rs[..., 1, 1])[..., None], omg1,
+                              omg0))
+    omg = np.where((acosinput <= -1)[..., None], np.pi * omgpi, omg)
+    return np.where((acosinput >= 1)[..., None], 0.0, omg)
+
 def RpToTrans(R, p):
     """Converts a rotation matrix and a position vector into homogeneous
     transformation matrix
@@ -242,6 +372,41 @@ def TransInv(T):
     Rt = np.array(R).T
     return np.r_[np.c_[Rt, -np.dot(Rt, p)], [[0, 0, 0, 1]]]
 
+def TransInvBatch(Ts):
+    """Inverts a stack of homogeneous transformation matrices
+
+    :param Ts: An array of homogeneous transformation matrices with shape
+               (..., 4, 4)
+    :return: The inverses of Ts, with shape (..., 4, 4)
+    Uses the structure of transformation matrices, as TransInv does.
+
+    Example input:
+        Ts = np.array([[[1, 0,  0, 0],
+                        [0, 0, -1, 0],
+                        [0, 1,  0, 3],
+                        [0, 0,  0, 1]],
+                       [[1, 0,  0, 1],
+                        [0, 1,  0, 2],
+                        [0, 0,  1, 3],
+                        [0, 0,  0, 1]]])
+    Output:
+        np.array([[[1,  0, 0,  0],
+                   [0,  0, 1, -3],
+                   [0, -1, 0,  0],
+                   [0,  0, 0,  1]],
+                  [[1,  0, 0, -1],
+                   [0,  1, 0, -2],
+                   [0,  0, 1, -3],
+                   [0,  0, 0,  1]]])
+    """
+    Ts = np.asarray(Ts, dtype=float)
+    Rt = np.swapaxes(Ts[..., 0: 3, 0: 3], -1, -2)
+    Tinv = np.zeros(Ts.shape)
+    Tinv[..., 0: 3, 0: 3] = Rt
+    Tinv[..., 0: 3, 3] = -np.matmul(Rt, Ts[..., 0: 3, 3: 4])[..., 0]
+    Tinv[..., 3, 3] = 1
+    return Tinv
+
 def VecTose3(V):
     """Converts a spatial velocity vector into a 4x4 matrix in se3
 
@@ -276,6 +441,30 @@ def se3ToVec(se3mat):
     return np.r_[[se3mat[2][1], se3mat[0][2], se3mat[1][0]],
                  [se3mat[0][3], se3mat[1][3], se3mat[2][3]]]
 
+def se3ToVecBatch(se3mats):
+    """Converts a stack of se3 matrices into spatial velocity vectors
+
+    :param se3mats: An array of 4x4 matrices in se3 with shape (..., 4, 4)
+    :return: The spatial velocity 6-vectors corresponding to se3mats, with
+             shape (..., 6)
+
+    Example Input:
+        se3mats = np.array([[[ 0, -3,  2, 4],
+                             [ 3,  0, -1, 5],
+                             [-2,  1,  0, 6],
+                             [ 0,  0,  0, 0]],
+                            [[ 0,  0,  0, 1],
+                             [ 0,  0,  0, 0],
+                             [ 0,  0,  0, 0],
+                             [ 0,  0,  0, 0]]])
+    Output:
+        np.array([[1, 2, 3, 4, 5, 6],
+                  [0, 0, 0, 1, 0, 0]])
+    """
+    se3mats = np.asarray(se3mats)
+    return np.concatenate([so3ToVecBatch(se3mats[..., 0: 3, 0: 3]),
+                           se3mats[..., 0: 3, 3]], axis=-1)
+
 def Adjoint(T):
     """Computes the adjoint representation of a homogeneous transformation
     matrix
@@ -300,6 +489,36 @@ def Adjoint(T):
     return np.r_[np.c_[R, np.zeros((3, 3))],
                  np.c_[np.dot(VecToso3(p), R), R]]
 
+def AdjointBatch(Ts):
+    """Computes the adjoint representations of a stack of homogeneous
+    transformation matrices
+
+    :param Ts: An array of homogeneous transformation matrices with shape
+               (..., 4, 4)
+    :return: The 6x6 adjoint representations [AdT] of Ts, with shape
+             (..., 6, 6)
+
+    Example Input:
+        Ts = np.array([[[1, 0,  0, 0],
+                        [0, 0, -1, 0],
+                        [0, 1,  0, 3],
+                        [0, 0,  0, 1]]])
+    Output:
+        np.array([[[1, 0,  0, 0, 0,  0],
+                   [0, 0, -1, 0, 0,  0],
+                   [0, 1,  0, 0, 0,  0],
+                   [0, 0,  3, 1, 0,  0],
+                   [3, 0,  0, 0, 0, -1],
+                   [0, 0,  0, 0, 1,  0]]])
+    """
+    Ts = np.asarray(Ts, dtype=float)
+    R = Ts[..., 0: 3, 0: 3]
+    AdT = np.zeros(Ts.shape[:-2] + (6, 6))
+    AdT[..., 0: 3, 0: 3] = R
+    AdT[..., 3: 6, 0: 3] = np.matmul(VecToso3Batch(Ts[..., 0: 3, 3]), R)
+    AdT[..., 3: 6, 3: 6] = R
+    return AdT
+
 def ScrewToAxis(q, s, h):
     """Takes a parametric description of a screw axis and converts it to a
     normalized screw axis
@@ -370,6 +589,51 @@ def MatrixExp6(se3mat):
                                   se3mat[0: 3, 3]) / theta],
                      [[0, 0, 0, 1]]]
 
+def MatrixExp6Batch(expc6s):
+    """Computes the matrix exponentials of a stack of exponential coordinates
+
+    :param expc6s: Either an array of 6-vectors of exponential coordinates
+                   S*theta with shape (..., 6) or an array of se3 matrices
+                   with shape (..., 4, 4)
+    :return: The matrix exponentials, with shape (..., 4, 4)
+    Evaluates the same closed-form expression as MatrixExp6 for every element
+    in one vectorized pass. Elements with a near-zero rotation are treated as
+    pure translations, as in MatrixExp6.
+
+    Example Input:
+        expc6s = np.array([[1.57079632, 0, 0, 0, 2.35619449, 2.35619449],
+                           [0,          0, 0, 1,          2,          3]])
+    Output:
+        np.array([[[1.0, 0.0,  0.0, 0.0],
+                   [0.0, 0.0, -1.0, 0.0],
+                   [0.0, 1.0,  0.0, 3.0],
+                   [  0,   0,    0,   1]],
+                  [[1.0, 0.0,  0.0, 1.0],
+                   [0.0, 1.0,  0.0, 2.0],
+                   [0.0, 0.0,  1.0, 3.0],
+                   [  0,   0,    0,   1]]])
+    """
+    expc6s = np.asarray(expc6s, dtype=float)
+    if expc6s.shape[-2:] == (4, 4):
+        expc6s = se3ToVecBatch(expc6s)
+    omgthetas = expc6s[..., 0: 3]
+    vs = expc6s[..., 3: 6]
+    theta = np.linalg.norm(omgthetas, axis=-1)
+    nearzero = NearZero(theta)
+    theta = np.where(nearzero, 1.0, theta)[..., None]
+    omgmat = VecToso3Batch(omgthetas / theta)
+    omgmat2 = np.matmul(omgmat, omgmat)
+    st = np.sin(theta)[..., None]
+    ct = np.cos(theta)[..., None]
+    R = np.eye(3) + st * omgmat + (1 - ct) * omgmat2
+    p = vs + np.matmul((1 - ct) * omgmat + (theta[..., None] - st) * omgmat2,
+                       vs[..., None])[..., 0] / theta
+    T = np.zeros(expc6s.shape[:-1] + (4, 4))
+    T[..., 0: 3, 0: 3] = np.where(nearzero[..., None, None], np.eye(3), R)
+    T[..., 0: 3, 3] = np.where(nearzero[..., None], vs, p)
+    T[..., 3, 3] = 1
+    return T
+
 def MatrixLog6(T):
     """Computes the matrix logarithm of a homogeneous transformation matrix
 
@@ -403,6 +667,46 @@ def MatrixLog6(T):
                                                                T[2][3]])],
                      [[0, 0, 0, 0]]]
 
+def MatrixLog6Batch(Ts):
+    """Computes the matrix logarithms of a stack of homogeneous
+    transformation matrices
+
+    :param Ts: An array of matrices in SE3 with shape (..., 4, 4)
+    :return: The exponential coordinates S*theta of the matrix logarithms of
+             Ts, with shape (..., 6)
+    Uses MatrixLog3Batch for the rotational part and applies the same
+    translational correction as MatrixLog6 to every element at once. The
+    results are returned as 6-vectors; they can be passed straight back to
+    MatrixExp6Batch.
+
+    Example Input:
+        Ts = np.array([[[1, 0,  0, 0],
+                        [0, 0, -1, 0],
+                        [0, 1,  0, 3],
+                        [0, 0,  0, 1]],
+                       [[1, 0,  0, 1],
+                        [0, 1,  0, 2],
+                        [0, 0,  1, 3],
+                        [0, 0,  0, 1]]])
+    Output:
+        np.array([[1.57079633, 0, 0, 0, 2.35619449, 2.35619449],
+                  [         0, 0, 0, 1,          2,          3]])
+    """
+    Ts = np.asarray(Ts, dtype=float)
+    omgthetas = MatrixLog3Batch(Ts[..., 0: 3, 0: 3])
+    ps = Ts[..., 0: 3, 3]
+    zeroomg = np.all(omgthetas == 0, axis=-1)
+    theta = np.arccos(np.clip((np.trace(Ts[..., 0: 3, 0: 3], axis1=-2,
+                                        axis2=-1) - 1) / 2.0, -1, 1))
+    theta = np.where(zeroomg, 1.0, theta)[..., None, None]
+    omgmat = VecToso3Batch(omgthetas)
+    Ginv = np.eye(3) - omgmat / 2.0 \
+           + (1.0 / theta - 1.0 / np.tan(theta / 2.0) / 2) \
+             * np.matmul(omgmat, omgmat) / theta
+    vs = np.matmul(Ginv, ps[..., None])[..., 0]
+    return np.concatenate([omgthetas,
+                           np.where(zeroomg[..., None], ps, vs)], axis=-1)
+
 def ProjectToSO3(mat):
     """Returns a projection of mat into SO(3)
 
@@ -590,6 +894,52 @@ def FKinBody(M, Blist, thetalist):
                                           * thetalist[i])))
     return T
 
+def FKinBodyBatch(M, Blist, thetamat):
+    """Computes forward kinematics in the body frame for many joint
+    configurations of an open chain robot
+
+    :param M: The home configuration (position and orientation) of the end-
+              effector
+    :param Blist: The joint screw axes in the end-effector frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetamat: An N x n matrix of joint coordinates, where each row is
+                     one configuration
+    :return: An N x 4 x 4 array of homogeneous transformation matrices
+             representing the end-effector frame at each configuration
+             (i.t.o Body Frame)
+    All N*n joint exponentials are evaluated with a single call to
+    MatrixExp6Batch; the product over the joints is then accumulated for all
+    configurations at once.
+
+    Example Input:
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Blist = np.array([[0, 0, -1, 2, 0,   0],
+                          [0, 0,  0, 0, 1,   0],
+                          [0, 0,  1, 0, 0, 0.1]]).T
+        thetamat = np.array([[np.pi / 2.0, 3, np.pi],
+                             [          0, 0,     0]])
+    Output:
+        np.array([[[0, 1,  0,         -5],
+                   [1, 0,  0,          4],
+                   [0, 0, -1, 1.68584073],
+                   [0, 0,  0,          1]],
+                  [[-1, 0,  0, 0],
+                   [ 0, 1,  0, 6],
+                   [ 0, 0, -1, 2],
+                   [ 0, 0,  0, 1]]])
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    exps = MatrixExp6Batch(thetamat[..., None] * np.array(Blist).T)
+    T = np.broadcast_to(np.array(M, dtype=float),
+                        thetamat.shape[:-1] + (4, 4))
+    for i in range(thetamat.shape[-1]):
+        T = np.matmul(T, exps[..., i, :, :])
+    return T
+
 def FKinSpace(M, Slist, thetalist):
     """Computes forward kinematics in the space frame for an open chain robot
 
@@ -624,6 +974,151 @@ def FKinSpace(M, Slist, thetalist):
                                        * thetalist[i])), T)
     return T
 
+def FKinSpaceBatch(M, Slist, thetamat):
+    """Computes forward kinematics in the space frame for many joint
+    configurations of an open chain robot
+
+    :param M: The home configuration (position and orientation) of the end-
+              effector
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetamat: An N x n matrix of joint coordinates, where each row is
+                     one configuration
+    :return: An N x 4 x 4 array of homogeneous transformation matrices
+             representing the end-effector frame at each configuration
+             (i.t.o Space Frame)
+    All N*n joint exponentials are evaluated with a single call to
+    MatrixExp6Batch; the product over the joints is then accumulated for all
+    configurations at once.
+
+    Example Input:
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        thetamat = np.array([[np.pi / 2.0, 3, np.pi],
+                             [          0, 0,     0]])
+    Output:
+        np.array([[[0, 1,  0,         -5],
+                   [1, 0,  0,          4],
+                   [0, 0, -1, 1.68584073],
+                   [0, 0,  0,          1]],
+                  [[-1, 0,  0, 0],
+                   [ 0, 1,  0, 6],
+                   [ 0, 0, -1, 2],
+                   [ 0, 0,  0, 1]]])
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    exps = MatrixExp6Batch(thetamat[..., None] * np.array(Slist).T)
+    T = np.broadcast_to(np.array(M, dtype=float),
+                        thetamat.shape[:-1] + (4, 4))
+    for i in range(thetamat.shape[-1] - 1, -1, -1):
+        T = np.matmul(exps[..., i, :, :], T)
+    return T
+
+def FKinSpaceFrames(Slist, thetalist, Mlist=None):
+    """Computes the frames of every link of an open chain robot in one
+    forward sweep
+
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetalist: A list of n joint coordinates
+    :param Mlist: List of link frames {i} relative to {i-1} at the home
+                  position (optional)
+    :return: An (n+1) x 4 x 4 array of frames. Without Mlist, entry i is the
+             cumulative product e^[S1]theta1...e^[Si]thetai (entry 0 is the
+             identity). With Mlist, entry i is additionally multiplied on the
+             right by the home configuration of link frame {i}, so it is the
+             configuration of frame {i} in the space frame
+    Each joint exponential is computed once and the products are
+    accumulated from the base outwards, so all frames together cost the same
+    as a single call to FKinSpace. The end-effector frame is
+    FKinSpaceFrames(Slist, thetalist)[n] multiplied by M, or, when Mlist is
+    given, the last entry multiplied by Mlist[n].
+
+    Example Input:
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        thetalist = np.array([np.pi / 2.0, 3, np.pi])
+    Output:
+        np.array([[[ 1, 0, 0,  0],
+                   [ 0, 1, 0,  0],
+                   [ 0, 0, 1,  0],
+                   [ 0, 0, 0,  1]],
+                  [[ 0, -1, 0, 4],
+                   [ 1,  0, 0, 4],
+                   [ 0,  0, 1, 0],
+                   [ 0,  0, 0, 1]],
+                  [[ 0, -1, 0, 1],
+                   [ 1,  0, 0, 4],
+                   [ 0,  0, 1, 0],
+                   [ 0,  0, 0, 1]],
+                  [[ 0,  1, 0,         -11],
+                   [-1,  0, 0,           4],
+                   [ 0,  0, 1, -0.31415927],
+                   [ 0,  0, 0,           1]]])
+    """
+    n = len(thetalist)
+    frames = np.zeros((n + 1, 4, 4))
+    frames[0] = np.eye(4)
+    for i in range(n):
+        frames[i + 1] = np.dot(frames[i], \
+                               MatrixExp6(VecTose3(np.array(Slist)[:, i] \
+                                                   * thetalist[i])))
+    if Mlist is not None:
+        Mi = np.eye(4)
+        for i in range(n):
+            Mi = np.dot(Mi, Mlist[i])
+            frames[i + 1] = np.dot(frames[i + 1], Mi)
+    return frames
+
+def FKinSpaceFramesBatch(Slist, thetamat, Mlist=None):
+    """Computes the frames of every link of an open chain robot for many
+    joint configurations
+
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetamat: An N x n matrix of joint coordinates, where each row is
+                     one configuration
+    :param Mlist: List of link frames {i} relative to {i-1} at the home
+                  position (optional)
+    :return: An N x (n+1) x 4 x 4 array, where row k holds the frames
+             FKinSpaceFrames(Slist, thetamat[k], Mlist)
+    All N*n joint exponentials are evaluated with a single call to
+    MatrixExp6Batch.
+
+    Example Input:
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        thetamat = np.array([[np.pi / 2.0, 3, np.pi],
+                             [          0, 0,     0]])
+    Output:
+        An array of shape (2, 4, 4, 4) whose first row is the output of the
+        FKinSpaceFrames example and whose second row is four identities
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    n = thetamat.shape[-1]
+    exps = MatrixExp6Batch(thetamat[..., None] * np.array(Slist).T)
+    frames = np.zeros(thetamat.shape[:-1] + (n + 1, 4, 4))
+    frames[..., 0, :, :] = np.eye(4)
+    for i in range(n):
+        frames[..., i + 1, :, :] = np.matmul(frames[..., i, :, :],
+                                             exps[..., i, :, :])
+    if Mlist is not None:
+        Mi = np.eye(4)
+        for i in range(n):
+            Mi = np.dot(Mi, Mlist[i])
+            frames[..., i + 1, :, :] = np.matmul(frames[..., i + 1, :, :], Mi)
+    return frames
+
 '''
 *** CHAPTER 5: VELOCITY KINEMATICS AND STATICS***
 '''
@@ -692,6 +1187,145 @@ def JacobianSpace(Slist, thetalist):
         Js[:, i] = np.dot(Adjoint(T), np.array(Slist)[:, i])
     return Js
 
+def FKinAndJacobianBody(M, Blist, thetalist):
+    """Computes the end-effector configuration and the body Jacobian of an
+    open chain robot together
+
+    :param M: The home configuration (position and orientation) of the end-
+              effector
+    :param Blist: The joint screw axes in the end-effector frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetalist: A list of joint coordinates
+    :return T: The end-effector frame at thetalist, as FKinBody
+    :return Jb: The body Jacobian at thetalist, as JacobianBody
+    FKinBody and JacobianBody evaluate the same chain of exponentials. Here
+    each exponential is computed once and shared by both results.
+
+    Example Input:
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Blist = np.array([[0, 0, -1, 2, 0,   0],
+                          [0, 0,  0, 0, 1,   0],
+                          [0, 0,  1, 0, 0, 0.1]]).T
+        thetalist = np.array([np.pi / 2.0, 3, np.pi])
+    Output:
+        (np.array([[0, 1,  0,         -5],
+                   [1, 0,  0,          4],
+                   [0, 0, -1, 1.68584073],
+                   [0, 0,  0,          1]]),
+         np.array([[ 0,  0,   0],
+                   [ 0,  0,   0],
+                   [-1,  0,   1],
+                   [-5,  0,   0],
+                   [ 0, -1,   0],
+                   [ 0,  0, 0.1]]))
+    """
+    Jb = np.array(Blist).copy().astype(float)
+    T = np.eye(4)
+    for i in range(len(thetalist) - 1, -1, -1):
+        Jb[:, i] = np.dot(Adjoint(T), np.array(Blist)[:, i])
+        T = np.dot(T, MatrixExp6(VecTose3(np.array(Blist)[:, i] \
+                                          * -thetalist[i])))
+    return np.dot(M, TransInv(T)), Jb
+
+def FKinAndJacobianSpace(M, Slist, thetalist):
+    """Computes the end-effector configuration and the space Jacobian of an
+    open chain robot together
+
+    :param M: The home configuration (position and orientation) of the end-
+              effector
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetalist: A list of joint coordinates
+    :return T: The end-effector frame at thetalist, as FKinSpace
+    :return Js: The space Jacobian at thetalist, as JacobianSpace
+    FKinSpace and JacobianSpace evaluate the same chain of exponentials.
+    Here each exponential is computed once and shared by both results.
+
+    Example Input:
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        thetalist = np.array([np.pi / 2.0, 3, np.pi])
+    Output:
+        (np.array([[0, 1,  0,         -5],
+                   [1, 0,  0,          4],
+                   [0, 0, -1, 1.68584073],
+                   [0, 0,  0,          1]]),
+         np.array([[0,  0,    0],
+                   [0,  0,    0],
+                   [1,  0,   -1],
+                   [4, -1,   -4],
+                   [0,  0,   -5],
+                   [0,  0, -0.1]]))
+    """
+    Js = np.array(Slist).copy().astype(float)
+    T = np.eye(4)
+    for i in range(len(thetalist)):
+        Js[:, i] = np.dot(Adjoint(T), np.array(Slist)[:, i])
+        T = np.dot(T, MatrixExp6(VecTose3(np.array(Slist)[:, i] \
+                                          * thetalist[i])))
+    return np.dot(T, M), Js
+
+def FKinAndJacobianSpaceBatch(M, Slist, thetamat):
+    """Computes the end-effector configurations and the space Jacobians of an
+    open chain robot for many joint configurations
+
+    :param M: The home configuration (position and orientation) of the end-
+              effector
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param thetamat: An N x n matrix of joint coordinates, where each row is
+                     one configuration
+    :return T: An N x 4 x 4 array of end-effector frames, as FKinSpaceBatch
+    :return Js: An N x 6 x n array of space Jacobians
+    The batched counterpart of FKinAndJacobianSpace. All N*n joint
+    exponentials are evaluated with a single call to MatrixExp6Batch and
+    shared by the poses and the Jacobians.
+
+    Example Input:
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        thetamat = np.array([[np.pi / 2.0, 3, np.pi]])
+    Output:
+        (np.array([[[0, 1,  0,         -5],
+                    [1, 0,  0,          4],
+                    [0, 0, -1, 1.68584073],
+                    [0, 0,  0,          1]]]),
+         np.array([[[0,  0,    0],
+                    [0,  0,    0],
+                    [1,  0,   -1],
+                    [4, -1,   -4],
+                    [0,  0,   -5],
+                    [0,  0, -0.1]]]))
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    Slist = np.array(Slist, dtype=float)
+    n = thetamat.shape[-1]
+    exps = MatrixExp6Batch(thetamat[..., None] * Slist.T)
+    Ts = np.empty(exps.shape)
+    Ts[..., 0, :, :] = np.eye(4)
+    for i in range(1, n):
+        Ts[..., i, :, :] = np.matmul(Ts[..., i - 1, :, :],
+                                     exps[..., i - 1, :, :])
+    Js = np.einsum('...ijk,ki->...ji', AdjointBatch(Ts), Slist)
+    T = np.matmul(np.matmul(Ts[..., n - 1, :, :], exps[..., n - 1, :, :]), M)
+    return T, Js
+
 '''
 *** CHAPTER 6: INVERSE KINEMATICS ***
 '''
@@ -744,18 +1378,15 @@ def IKinBody(Blist, M, T, thetalist0, eomg, ev):
     thetalist = np.array(thetalist0).copy()
     i = 0
     maxiterations = 20
-    Vb = se3ToVec(MatrixLog6(np.dot(TransInv(FKinBody(M, Blist, \
-                                                      thetalist)), T)))
+    Tsb, Jb = FKinAndJacobianBody(M, Blist, thetalist)
+    Vb = se3ToVec(MatrixLog6(np.dot(TransInv(Tsb), T)))
     err = np.linalg.norm([Vb[0], Vb[1], Vb[2]]) > eomg \
           or np.linalg.norm([Vb[3], Vb[4], Vb[5]]) > ev
     while err and i < maxiterations:
-        thetalist = thetalist \
-                    + np.dot(np.linalg.pinv(JacobianBody(Blist, \
-                                                         thetalist)), Vb)
+        thetalist = thetalist + np.dot(np.linalg.pinv(Jb), Vb)
         i = i + 1
-        Vb \
-        = se3ToVec(MatrixLog6(np.dot(TransInv(FKinBody(M, Blist, \
-                                                       thetalist)), T)))
+        Tsb, Jb = FKinAndJacobianBody(M, Blist, thetalist)
+        Vb = se3ToVec(MatrixLog6(np.dot(TransInv(Tsb), T)))
         err = np.linalg.norm([Vb[0], Vb[1], Vb[2]]) > eomg \
               or np.linalg.norm([Vb[3], Vb[4], Vb[5]]) > ev
     return (thetalist, not err)
@@ -808,55 +1439,575 @@ def IKinSpace(Slist, M, T, thetalist0, eomg, ev):
     thetalist = np.array(thetalist0).copy()
     i = 0
     maxiterations = 20
-    Tsb = FKinSpace(M,Slist, thetalist)
+    Tsb, Js = FKinAndJacobianSpace(M, Slist, thetalist)
     Vs = np.dot(Adjoint(Tsb), \
                 se3ToVec(MatrixLog6(np.dot(TransInv(Tsb), T))))
     err = np.linalg.norm([Vs[0], Vs[1], Vs[2]]) > eomg \
           or np.linalg.norm([Vs[3], Vs[4], Vs[5]]) > ev
     while err and i < maxiterations:
-        thetalist = thetalist \
-                    + np.dot(np.linalg.pinv(JacobianSpace(Slist, \
-                                                          thetalist)), Vs)
+        thetalist = thetalist + np.dot(np.linalg.pinv(Js), Vs)
         i = i + 1
-        Tsb = FKinSpace(M, Slist, thetalist)
+        Tsb, Js = FKinAndJacobianSpace(M, Slist, thetalist)
         Vs = np.dot(Adjoint(Tsb), \
                     se3ToVec(MatrixLog6(np.dot(TransInv(Tsb), T))))
         err = np.linalg.norm([Vs[0], Vs[1], Vs[2]]) > eomg \
               or np.linalg.norm([Vs[3], Vs[4], Vs[5]]) > ev
     return (thetalist, not err)
 
-'''
-*** CHAPTER 8: DYNAMICS OF OPEN CHAINS ***
-'''
-
-def ad(V):
-    """Calculate the 6x6 matrix [adV] of the given 6-vector
+def _IKinLM(Screwlist, M, T, thetalist0, eomg, ev, maxiterations, timeout, \
+            thetalistmin, thetalistmax, damping, space, deadline=None, \
+            stop=None):
+    """Runs the damped least-squares iterations shared by IKinBodyLM and
+    IKinSpaceLM
 
-    :param V: A 6-vector spatial velocity
-    :return: The corresponding 6x6 matrix [adV]
+    Besides maxiterations and the relative timeout, the iterations end at the
+    absolute time.time() deadline, if given, and as soon as the optional
+    threading.Event stop is set by another thread.
+    """
+    starttime = time.time()
+    thetalist = np.array(thetalist0, dtype=float).copy()
+    if thetalistmin is not None or thetalistmax is not None:
+        thetalist = np.clip(thetalist, thetalistmin, thetalistmax)
+
+    def error(thetalist):
+        if space:
+            Tsb, J = FKinAndJacobianSpace(M, Screwlist, thetalist)
+            V = np.dot(Adjoint(Tsb), \
+                       se3ToVec(MatrixLog6(np.dot(TransInv(Tsb), T))))
+        else:
+            Tsb, J = FKinAndJacobianBody(M, Screwlist, thetalist)
+            V = se3ToVec(MatrixLog6(np.dot(TransInv(Tsb), T)))
+        return V, J
+
+    V, J = error(thetalist)
+    lam = damping
+    lammax = 1e10
+    stalled = False
+    i = 0
+    err = np.linalg.norm(V[0: 3]) > eomg or np.linalg.norm(V[3: 6]) > ev
+    while err and i < maxiterations \
+          and (timeout is None or time.time() - starttime < timeout) \
+          and (deadline is None or time.time() < deadline) \
+          and (stop is None or not stop.is_set()):
+        i = i + 1
+        try:
+            L = np.linalg.cholesky(np.dot(J, J.T) + lam * np.eye(6))
+        except np.linalg.LinAlgError:
+            L = None
+        if L is None:
+            if lam >= lammax:
+                stalled = True
+                break
+            lam = min(lam * 10.0, lammax)
+            continue
+        dthetalist = np.dot(J.T, np.linalg.solve(L.T, np.linalg.solve(L, V)))
+        thetanext = thetalist + dthetalist
+        if thetalistmin is not None or thetalistmax is not None:
+            thetanext = np.clip(thetanext, thetalistmin, thetalistmax)
+        Vnext, Jnext = error(thetanext)
+        if np.dot(Vnext, Vnext) < np.dot(V, V):
+            thetalist, V, J = thetanext, Vnext, Jnext
+            lam = max(lam / 3.0, 1e-8)
+            err = np.linalg.norm(V[0: 3]) > eomg \
+                  or np.linalg.norm(V[3: 6]) > ev
+        elif lam >= lammax:
+            # Even a damped gradient step no longer reduces the error
+            stalled = True
+            break
+        else:
+            lam = min(lam * 10.0, lammax)
+    stats = {'iterations': i,
+             'omgerror': float(np.linalg.norm(V[0: 3])),
+             'verror': float(np.linalg.norm(V[3: 6])),
+             'time': time.time() - starttime,
+             'stalled': stalled}
+    return (thetalist, not err, stats)
+
+def IKinBodyLM(Blist, M, T, thetalist0, eomg, ev, maxiterations=100, \
+               timeout=None, thetalistmin=None, thetalistmax=None, \
+               damping=1e-3):
+    """Computes inverse kinematics in the body frame for an open chain robot
+    using damped least squares
 
-    Used to calculate the Lie bracket [V1, V2] = [adV1]V2
+    :param Blist: The joint screw axes in the end-effector frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param M: The home configuration of the end-effector
+    :param T: The desired end-effector configuration Tsd
+    :param thetalist0: An initial guess of joint angles that are close to
+                       satisfying Tsd
+    :param eomg: A small positive tolerance on the end-effector orientation
+                 error. The returned joint angles must give an end-effector
+                 orientation error less than eomg
+    :param ev: A small positive tolerance on the end-effector linear position
+               error. The returned joint angles must give an end-effector
+               position error less than ev
+    :param maxiterations: The maximum number of iterations
+    :param timeout: An optional wall-clock budget in seconds. The solver
+                    stops after the first iteration that exceeds it
+    :param thetalistmin: Optional lower joint limits (scalar or n-vector)
+    :param thetalistmax: Optional upper joint limits (scalar or n-vector)
+    :param damping: The initial damping factor lambda
+    :return thetalist: Joint angles that achieve T within the specified
+                       tolerances,
+    :return success: A logical value where TRUE means that the function found
+                     a solution and FALSE means that it ran out of iterations
+                     or time, or stalled, without finding a solution within
+                     the tolerances eomg and ev.
+    :return stats: A dictionary with the number of iterations
+                   ('iterations'), the final orientation and position errors
+                   ('omgerror', 'verror'), the elapsed wall time in seconds
+                   ('time') and whether the solver stopped because it
+                   stalled ('stalled')
+    Uses a Levenberg-Marquardt iteration. Each step solves the 6x6 damped
+    normal equations (Jb Jb^T + lambda I) y = Vb with a Cholesky
+    factorization and moves by Jb^T y, which stays well defined at
+    singularities where np.linalg.pinv amplifies the error. A step is kept
+    only if it reduces the error, after which lambda is decreased; otherwise
+    lambda is increased and the step is retried. If no step reduces the error
+    even with lambda at its cap of 1e10, the solver has stalled (typically on
+    an unreachable target) and stops. Joint limits, when given,
+    are enforced by clipping each iterate. The pose and the Jacobian are
+    evaluated together with FKinAndJacobianBody.
 
     Example Input:
-        V = np.array([1, 2, 3, 4, 5, 6])
+        Blist = np.array([[0, 0, -1, 2, 0,   0],
+                          [0, 0,  0, 0, 1,   0],
+                          [0, 0,  1, 0, 0, 0.1]]).T
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        T = np.array([[0, 1,  0,     -5],
+                      [1, 0,  0,      4],
+                      [0, 0, -1, 1.6858],
+                      [0, 0,  0,      1]])
+        thetalist0 = np.array([1.5, 2.5, 3])
+        eomg = 0.01
+        ev = 0.001
     Output:
-        np.array([[ 0, -3,  2,  0,  0,  0],
-                  [ 3,  0, -1,  0,  0,  0],
-                  [-2,  1,  0,  0,  0,  0],
-                  [ 0, -6,  5,  0, -3,  2],
-                  [ 6,  0, -4,  3,  0, -1],
-                  [-5,  4,  0, -2,  1,  0]])
+        (np.array([1.57073784, 2.99966358, 3.14154253]), True,
+         {'iterations': 2, 'omgerror': 8.36578323e-06,
+          'verror': 0.00044808, 'time': 0.0002,
+          'stalled': False})
     """
-    omgmat = VecToso3([V[0], V[1], V[2]])
-    return np.r_[np.c_[omgmat, np.zeros((3, 3))],
-                 np.c_[VecToso3([V[3], V[4], V[5]]), omgmat]]
+    return _IKinLM(Blist, M, T, thetalist0, eomg, ev, maxiterations, \
+                   timeout, thetalistmin, thetalistmax, damping, False)
 
-def InverseDynamics(thetalist, dthetalist, ddthetalist, g, Ftip, Mlist, \
-                    Glist, Slist):
-    """Computes inverse dynamics in the space frame for an open chain robot
+def IKinSpaceLM(Slist, M, T, thetalist0, eomg, ev, maxiterations=100, \
+                timeout=None, thetalistmin=None, thetalistmax=None, \
+                damping=1e-3):
+    """Computes inverse kinematics in the space frame for an open chain robot
+    using damped least squares
 
-    :param thetalist: n-vector of joint variables
-    :param dthetalist: n-vector of joint rates
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param M: The home configuration of the end-effector
+    :param T: The desired end-effector configuration Tsd
+    :param thetalist0: An initial guess of joint angles that are close to
+                       satisfying Tsd
+    :param eomg: A small positive tolerance on the end-effector orientation
+                 error. The returned joint angles must give an end-effector
+                 orientation error less than eomg
+    :param ev: A small positive tolerance on the end-effector linear position
+               error. The returned joint angles must give an end-effector
+               position error less than ev
+    :param maxiterations: The maximum number of iterations
+    :param timeout: An optional wall-clock budget in seconds. The solver
+                    stops after the first iteration that exceeds it
+    :param thetalistmin: Optional lower joint limits (scalar or n-vector)
+    :param thetalistmax: Optional upper joint limits (scalar or n-vector)
+    :param damping: The initial damping factor lambda
+    :return thetalist: Joint angles that achieve T within the specified
+                       tolerances,
+    :return success: A logical value where TRUE means that the function found
+                     a solution and FALSE means that it ran out of iterations
+                     or time, or stalled, without finding a solution within
+                     the tolerances eomg and ev.
+    :return stats: A dictionary with the number of iterations
+                   ('iterations'), the final orientation and position errors
+                   ('omgerror', 'verror'), the elapsed wall time in seconds
+                   ('time') and whether the solver stopped because it
+                   stalled ('stalled')
+    The space-frame counterpart of IKinBodyLM: the same Levenberg-Marquardt
+    iteration is applied to the space twist error Vs and the space Jacobian.
+
+    Example Input:
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        T = np.array([[0, 1,  0,     -5],
+                      [1, 0,  0,      4],
+                      [0, 0, -1, 1.6858],
+                      [0, 0,  0,      1]])
+        thetalist0 = np.array([1.5, 2.5, 3])
+        eomg = 0.01
+        ev = 0.001
+    Output:
+        (np.array([1.5706855, 2.9995527, 3.14152284]), True,
+         {'iterations': 2, 'omgerror': 4.10188321e-05,
+          'verror': 0.000452, 'time': 0.0002,
+          'stalled': False})
+    """
+    return _IKinLM(Slist, M, T, thetalist0, eomg, ev, maxiterations, \
+                   timeout, thetalistmin, thetalistmax, damping, True)
+
+def IKinSpaceBatch(Slist, M, Tmat, thetamat0, eomg, ev, maxiterations=20, \
+                   damping=0):
+    """Computes inverse kinematics in the space frame for many target
+    configurations of an open chain robot at once
+
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param M: The home configuration of the end-effector
+    :param Tmat: An N x 4 x 4 array of desired end-effector configurations
+    :param thetamat0: An N x n matrix of initial guesses, one row per target
+                      (a single n-vector is used for every target)
+    :param eomg: A small positive tolerance on the end-effector orientation
+                 error
+    :param ev: A small positive tolerance on the end-effector linear position
+               error
+    :param maxiterations: The maximum number of iterations
+    :param damping: An optional damping factor lambda. When zero, each step
+                    uses the pseudoinverse of the Jacobian exactly as
+                    IKinSpace does; when positive, it uses the damped least
+                    squares step Js^T (Js Js^T + lambda I)^-1 Vs
+    :return thetamat: An N x n matrix of joint angles, one row per target
+    :return success: A boolean N-vector that is True where the row of
+                     thetamat achieves its target within eomg and ev
+    Runs the Newton-Raphson iteration of IKinSpace for all targets together.
+    Every iteration evaluates the poses, Jacobians and twist errors of the
+    targets that have not yet converged with the batched kinematics
+    functions; converged targets are masked out and keep their solution.
+
+    Example Input:
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Tmat = np.array([[[0, 1,  0,     -5],
+                          [1, 0,  0,      4],
+                          [0, 0, -1, 1.6858],
+                          [0, 0,  0,      1]]])
+        thetamat0 = np.array([[1.5, 2.5, 3]])
+        eomg = 0.01
+        ev = 0.001
+    Output:
+        (np.array([[1.57073783, 2.99966384, 3.1415342]]), np.array([True]))
+    """
+    Tmat = np.asarray(Tmat, dtype=float)
+    N = Tmat.shape[0]
+    thetamat = np.array(np.broadcast_to(np.asarray(thetamat0, dtype=float), \
+                                        (N, np.array(Slist).shape[1])))
+
+    def error(thetamat, Tmat):
+        Tsb, Js = FKinAndJacobianSpaceBatch(M, Slist, thetamat)
+        Vb = MatrixLog6Batch(np.matmul(TransInvBatch(Tsb), Tmat))
+        return np.einsum('...ij,...j->...i', AdjointBatch(Tsb), Vb), Js
+
+    Vs, Js = error(thetamat, Tmat)
+    err = (np.linalg.norm(Vs[:, 0: 3], axis=1) > eomg) \
+          | (np.linalg.norm(Vs[:, 3: 6], axis=1) > ev)
+    i = 0
+    while err.any() and i < maxiterations:
+        idx = np.nonzero(err)[0]
+        if damping > 0:
+            JsT = np.swapaxes(Js[idx], 1, 2)
+            y = np.linalg.solve(np.matmul(Js[idx], JsT) \
+                                + damping * np.eye(6), Vs[idx][..., None])
+            thetamat[idx] += np.matmul(JsT, y)[..., 0]
+        else:
+            thetamat[idx] += np.matmul(np.linalg.pinv(Js[idx]), \
+                                       Vs[idx][..., None])[..., 0]
+        i = i + 1
+        Vs[idx], Js[idx] = error(thetamat[idx], Tmat[idx])
+        err[idx] = (np.linalg.norm(Vs[idx, 0: 3], axis=1) > eomg) \
+                   | (np.linalg.norm(Vs[idx, 3: 6], axis=1) > ev)
+    return (thetamat, ~err)
+
+def CartesianPathToJointPath(Slist, M, Xlist, thetalist0, eomg, ev, \
+                             maxiterations=100, blocksize=64):
+    """Converts a dense end-effector path into a joint path by continuation,
+    warm-starting each configuration from the solution of the previous one
+
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param M: The home configuration of the end-effector
+    :param Xlist: The N desired end-effector configurations in order, as a
+                  list or an N x 4 x 4 array (e.g. from CartesianTrajectory)
+    :param thetalist0: An initial guess of joint angles close to satisfying
+                       the first configuration, typically the current state
+    :param eomg: A small positive tolerance on the end-effector orientation
+                 error
+    :param ev: A small positive tolerance on the end-effector linear position
+               error
+    :param maxiterations: The maximum number of iterations of the fallback
+                          IKinSpaceLM solve
+    :param blocksize: The maximum number of configurations predicted and
+                      corrected together
+    :return thetamat: An N x n matrix of joint angles, one row per
+                      configuration
+    :return success: A boolean N-vector that is True where the row of
+                     thetamat achieves its configuration within eomg and ev
+    :return stats: A dictionary with the number of configurations solved by
+                   a single Newton-Raphson correction ('corrections'), the
+                   number that needed the full IKinSpaceLM solve
+                   ('fallbacks') and the elapsed wall time in seconds
+                   ('time')
+    Along a dense path the last solution is close to the next
+    configurations. Each is predicted from it by the step pinv(Js) Vs with
+    the Jacobian already evaluated there, then corrected by one
+    Newton-Raphson step, a block of configurations at a time with the
+    batched kinematics functions. The block is accepted up to its first
+    configuration that misses the tolerances, and then shrinks; a
+    configuration that misses them right after the last solution is solved
+    by IKinSpaceLM, again from the last solution, which keeps the joint path
+    on one solution branch.
+
+    Example Input:
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        Xlist = mr.FKinSpaceBatch(M, Slist, \
+                mr.JointTrajectory(np.array([1.5, 2.5, 3]), \
+                                   np.array([1.6, 3, 3.1]), 1, 5, 5))
+        thetalist0 = np.array([1.5, 2.5, 3])
+        eomg = 0.001
+        ev = 0.0001
+    Output:
+        (np.array([[       1.5,        2.5,          3],
+                   [1.51035156, 2.55175778, 3.01035156],
+                   [1.54999656,   2.749982, 3.04999656],
+                   [1.58964715, 2.94823551, 3.08964715],
+                   [1.59999674, 2.99998298, 3.09999674]]),
+         np.array([True, True, True, True, True]),
+         {'corrections': 5, 'fallbacks': 0, 'time': 0.0023})
+    """
+    starttime = time.time()
+    Xlist = np.asarray(Xlist, dtype=float)
+    N = len(Xlist)
+    thetalist = np.array(thetalist0, dtype=float).copy()
+    thetamat = np.zeros((N, len(thetalist)))
+    success = np.zeros(N, dtype=bool)
+    stats = {'corrections': 0, 'fallbacks': 0}
+
+    def error(Tsb, Tmat):
+        Vb = MatrixLog6Batch(np.matmul(TransInvBatch(Tsb), Tmat))
+        Vs = np.einsum('...ij,...j->...i', AdjointBatch(Tsb), Vb)
+        return Vs, (np.linalg.norm(Vs[:, 0: 3], axis=1) <= eomg) \
+                   & (np.linalg.norm(Vs[:, 3: 6], axis=1) <= ev)
+
+    Tsb, Js = FKinAndJacobianSpace(M, Slist, thetalist)
+    i = 0
+    B = blocksize
+    while i < N:
+        block = Xlist[i: i + B]
+        # Predict from the last solution, then correct once
+        Vs = error(Tsb[None], block)[0]
+        thetaseeds = thetalist + np.dot(Vs, np.linalg.pinv(Js).T)
+        Tc, Jc = FKinAndJacobianSpaceBatch(M, Slist, thetaseeds)
+        Vs = error(Tc, block)[0]
+        thetac = thetaseeds + np.matmul(np.linalg.pinv(Jc), \
+                                        Vs[..., None])[..., 0]
+        Tc, Jc = FKinAndJacobianSpaceBatch(M, Slist, thetac)
+        ok = error(Tc, block)[1]
+        naccept = len(block) if ok.all() else int(np.argmin(ok))
+        if naccept > 0:
+            thetamat[i: i + naccept] = thetac[: naccept]
+            success[i: i + naccept] = True
+            stats['corrections'] += naccept
+            thetalist = thetac[naccept - 1]
+            Tsb, Js = Tc[naccept - 1], Jc[naccept - 1]
+            i = i + naccept
+        if naccept == len(block):
+            B = min(2 * B, blocksize)
+            continue
+        B = max(B // 2, 1)
+        if naccept == 0:
+            stats['fallbacks'] += 1
+            thetalist, success[i] = IKinSpaceLM(Slist, M, Xlist[i], \
+                                                thetalist, eomg, ev, \
+                                                maxiterations)[: 2]
+            Tsb, Js = FKinAndJacobianSpace(M, Slist, thetalist)
+            thetamat[i] = thetalist
+            i = i + 1
+    stats['time'] = time.time() - starttime
+    return thetamat, success, stats
+
+def IKinSpaceMultiStart(Slist, M, T, thetalist0, eomg, ev, seeds=None, \
+                        nseeds=8, thetalistmin=None, thetalistmax=None, \
+                        select='first', timeout=None, executor=None, \
+                        maxiterations=100):
+    """Computes inverse kinematics in the space frame from several initial
+    guesses in parallel
+
+    :param Slist: The joint screw axes in the space frame when the
+                  manipulator is at the home position, in the format of a
+                  matrix with axes as the columns
+    :param M: The home configuration of the end-effector
+    :param T: The desired end-effector configuration Tsd
+    :param thetalist0: The preferred initial guess. It is always tried first
+                       and is the reference for select='closest'
+    :param eomg: A small positive tolerance on the end-effector orientation
+                 error
+    :param ev: A small positive tolerance on the end-effector linear position
+               error
+    :param seeds: An optional k x n matrix of additional initial guesses. If
+                  omitted, nseeds - 1 guesses are drawn uniformly between
+                  the joint limits, or in [-pi, pi] where none are given
+    :param nseeds: The total number of initial guesses when seeds is omitted
+    :param thetalistmin: Optional lower joint limits (scalar or n-vector)
+    :param thetalistmax: Optional upper joint limits (scalar or n-vector)
+    :param select: 'first' returns the first solution found; 'closest'
+                   returns, among the solutions found before the deadline,
+                   the one closest to thetalist0
+    :param timeout: An optional wall-clock budget in seconds for the whole
+                    call
+    :param executor: An optional concurrent.futures executor to run the
+                     solves on. A ThreadPoolExecutor or ProcessPoolExecutor
+                     can be kept alive and reused between calls; if omitted,
+                     a thread pool is created for this call
+    :param maxiterations: The maximum number of iterations of each solve
+    :return thetalist: The selected joint angles, or, if no solve succeeded,
+                       those with the smallest twist error among the solves
+                       that finished
+    :return success: True if thetalist achieves T within eomg and ev
+    Each initial guess is solved with the IKinSpaceLM iteration as a
+    separate task. As soon as the selection rule is satisfied, or the budget
+    runs out, the tasks that have not started are cancelled and the function
+    returns without waiting for the ones still running. Every task stops at
+    the absolute deadline starttime + timeout, so tasks that were queued do
+    not run past the caller's budget. On a thread pool, the default, running
+    tasks also share a threading.Event that is set on return, so they stop
+    after their current iteration. An event cannot be shared with the
+    workers of a ProcessPoolExecutor, so there running tasks are only bounded
+    by timeout and maxiterations.
+
+    Example Input:
+        Slist = np.array([[0, 0,  1,  4, 0,    0],
+                          [0, 0,  0,  0, 1,    0],
+                          [0, 0, -1, -6, 0, -0.1]]).T
+        M = np.array([[-1, 0,  0, 0],
+                      [ 0, 1,  0, 6],
+                      [ 0, 0, -1, 2],
+                      [ 0, 0,  0, 1]])
+        T = np.array([[0, 1,  0,     -5],
+                      [1, 0,  0,      4],
+                      [0, 0, -1, 1.6858],
+                      [0, 0,  0,      1]])
+        thetalist0 = np.array([1.5, 2.5, 3])
+        eomg = 0.01
+        ev = 0.001
+        thetalist, success = mr.IKinSpaceMultiStart(Slist, M, T, thetalist0,
+                                                    eomg, ev, timeout=0.05,
+                                                    select='closest')
+    Output:
+        (np.array([1.5706855, 2.9995527, 3.14152284]), True)
+    """
+    import concurrent.futures
+    import threading
+    starttime = time.time()
+    deadline = None if timeout is None else starttime + timeout
+    thetalist0 = np.array(thetalist0, dtype=float)
+    if seeds is None:
+        low = -np.pi if thetalistmin is None else thetalistmin
+        high = np.pi if thetalistmax is None else thetalistmax
+        seeds = np.random.uniform(low, high, (nseeds - 1, len(thetalist0)))
+    seeds = np.r_[[thetalist0], np.reshape(seeds, (-1, len(thetalist0)))]
+    ownexecutor = executor is None
+    if ownexecutor:
+        executor = concurrent.futures.ThreadPoolExecutor()
+    stop = None
+    if not isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        stop = threading.Event()
+    futures = [executor.submit(_IKinLM, Slist, M, T, seed, eomg, ev, \
+                               maxiterations, None, thetalistmin, \
+                               thetalistmax, 1e-3, True, deadline, stop) \
+               for seed in seeds]
+    best = None
+    fallback = None
+    try:
+        pending = set(futures)
+        while pending:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0)
+            done, pending \
+            = concurrent.futures.wait(pending, timeout=remaining, \
+                     return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                thetalist, success, stats = future.result()
+                if success:
+                    distance = np.linalg.norm(thetalist - thetalist0)
+                    if best is None or distance < best[1]:
+                        best = (thetalist, distance)
+                else:
+                    error = stats['omgerror'] + stats['verror']
+                    if fallback is None or error < fallback[1]:
+                        fallback = (thetalist, error)
+            if best is not None and select == 'first':
+                break
+    finally:
+        if stop is not None:
+            stop.set()
+        for future in futures:
+            future.cancel()
+        if ownexecutor:
+            executor.shutdown(wait=False)
+    if best is not None:
+        return (best[0], True)
+    if fallback is not None:
+        return (fallback[0], False)
+    return (thetalist0, False)
+
+'''
+*** CHAPTER 8: DYNAMICS OF OPEN CHAINS ***
+'''
+
+def ad(V):
+    """Calculate the 6x6 matrix [adV] of the given 6-vector
+
+    :param V: A 6-vector spatial velocity
+    :return: The corresponding 6x6 matrix [adV]
+
+    Used to calculate the Lie bracket [V1, V2] = [adV1]V2
+
+    Example Input:
+        V = np.array([1, 2, 3, 4, 5, 6])
+    Output:
+        np.array([[ 0, -3,  2,  0,  0,  0],
+                  [ 3,  0, -1,  0,  0,  0],
+                  [-2,  1,  0,  0,  0,  0],
+                  [ 0, -6,  5,  0, -3,  2],
+                  [ 6,  0, -4,  3,  0, -1],
+                  [-5,  4,  0, -2,  1,  0]])
+    """
+    omgmat = VecToso3([V[0], V[1], V[2]])
+    return np.r_[np.c_[omgmat, np.zeros((3, 3))],
+                 np.c_[VecToso3([V[3], V[4], V[5]]), omgmat]]
+
+def InverseDynamics(thetalist, dthetalist, ddthetalist, g, Ftip, Mlist, \
+                    Glist, Slist):
+    """Computes inverse dynamics in the space frame for an open chain robot
+
+    :param thetalist: n-vector of joint variables
+    :param dthetalist: n-vector of joint rates
     :param ddthetalist: n-vector of joint accelerations
     :param g: Gravity vector g
     :param Ftip: Spatial force applied by the end-effector expressed in frame
@@ -933,6 +2084,113 @@ def InverseDynamics(thetalist, dthetalist, ddthetalist, g, Ftip, Mlist, \
         taulist[i] = np.dot(np.array(Fi).T, Ai[:, i])
     return taulist
 
+def InverseDynamicsBatch(thetamat, dthetamat, ddthetamat, g, Ftipmat, Mlist, \
+                         Glist, Slist):
+    """Computes inverse dynamics in the space frame for many joint states at
+    once
+
+    :param thetamat: An N x n matrix of joint variables
+    :param dthetamat: An N x n matrix of joint rates
+    :param ddthetamat: An N x n matrix of joint accelerations
+    :param g: Gravity vector g, or an N x 3 matrix of gravity vectors
+    :param Ftipmat: A spatial force applied by the end-effector expressed in
+                    frame {n+1}, or an N x 6 matrix of such forces (a scalar
+                    0 means no tip force)
+    :param Mlist: List of link frames {i} relative to {i-1} at the home
+                  position, with shape (n+1, 4, 4), or (N, n+1, 4, 4) for a
+                  different model per row
+    :param Glist: Spatial inertia matrices Gi of the links, with shape
+                  (n, 6, 6), or (N, n, 6, 6) for a different model per row
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :return: The N x n matrix of required joint forces/torques
+    Runs the same forward-backward Newton-Euler iterations as
+    InverseDynamics, with each recursion step over the joints evaluated for
+    all N rows at once.
+
+    Example Input (3 Link Robot):
+        thetamat = np.array([[0.1, 0.1, 0.1],
+                             [0.2, 0.3, 0.4]])
+        dthetamat = np.array([[0.1, 0.2, 0.3],
+                              [0.1, 0.2, 0.3]])
+        ddthetamat = np.array([[2, 1.5, 1],
+                               [0,   0, 0]])
+        g = np.array([0, 0, -9.8])
+        Ftipmat = np.array([1, 1, 1, 1, 1, 1])
+        M01 = np.array([[1, 0, 0,        0],
+                        [0, 1, 0,        0],
+                        [0, 0, 1, 0.089159],
+                        [0, 0, 0,        1]])
+        M12 = np.array([[ 0, 0, 1,    0.28],
+                        [ 0, 1, 0, 0.13585],
+                        [-1, 0, 0,       0],
+                        [ 0, 0, 0,       1]])
+        M23 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0, -0.1197],
+                        [0, 0, 1,   0.395],
+                        [0, 0, 0,       1]])
+        M34 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0,       0],
+                        [0, 0, 1, 0.14225],
+                        [0, 0, 0,       1]])
+        G1 = np.diag([0.010267, 0.010267, 0.00666, 3.7, 3.7, 3.7])
+        G2 = np.diag([0.22689, 0.22689, 0.0151074, 8.393, 8.393, 8.393])
+        G3 = np.diag([0.0494433, 0.0494433, 0.004095, 2.275, 2.275, 2.275])
+        Glist = np.array([G1, G2, G3])
+        Mlist = np.array([M01, M12, M23, M34])
+        Slist = np.array([[1, 0, 1,      0, 1,     0],
+                          [0, 1, 0, -0.089, 0,     0],
+                          [0, 1, 0, -0.089, 0, 0.425]]).T
+    Output:
+        np.array([[ 74.69616155, -33.06766016,  -3.23057314],
+                  [ 46.80725448, -32.98771385,  -2.85701545]])
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    dthetamat = np.asarray(dthetamat, dtype=float)
+    ddthetamat = np.asarray(ddthetamat, dtype=float)
+    Mlist = np.asarray(Mlist, dtype=float)
+    Glist = np.asarray(Glist, dtype=float)
+    Slist = np.asarray(Slist, dtype=float)
+    N, n = thetamat.shape
+    Mi = np.eye(4)
+    Ai = [None] * n
+    AdTi = [None] * (n + 1)
+    Vi = [np.zeros((N, 6))] * (n + 1)
+    Vdi = [None] * (n + 1)
+    Vdi[0] = np.zeros((N, 6))
+    Vdi[0][:, 3: 6] = -np.asarray(g, dtype=float)
+    AdTi[n] = AdjointBatch(TransInvBatch(Mlist[..., n, :, :]))
+    Fi = np.array(np.broadcast_to(Ftipmat, (N, 6)), dtype=float)
+    taumat = np.zeros((N, n))
+    for i in range(n):
+        Mi = np.matmul(Mi, Mlist[..., i, :, :])
+        Ai[i] = np.matmul(AdjointBatch(TransInvBatch(Mi)), Slist[:, i])
+        AdTi[i] = AdjointBatch(np.matmul(MatrixExp6Batch(Ai[i] \
+                                         * -thetamat[:, i: i + 1]), \
+                               TransInvBatch(Mlist[..., i, :, :])))
+        Vi[i + 1] = np.matmul(AdTi[i], Vi[i][:, :, None])[:, :, 0] \
+                    + Ai[i] * dthetamat[:, i: i + 1]
+        # [adV]A, with V = (w, v) and A = (aw, av)
+        A = np.broadcast_to(Ai[i], (N, 6))
+        w, v = Vi[i + 1][:, 0: 3], Vi[i + 1][:, 3: 6]
+        adVA = np.c_[np.cross(w, A[:, 0: 3]), \
+                     np.cross(v, A[:, 0: 3]) + np.cross(w, A[:, 3: 6])]
+        Vdi[i + 1] = np.matmul(AdTi[i], Vdi[i][:, :, None])[:, :, 0] \
+                     + Ai[i] * ddthetamat[:, i: i + 1] \
+                     + adVA * dthetamat[:, i: i + 1]
+    for i in range(n - 1, -1, -1):
+        G = Glist[..., i, :, :]
+        P = np.matmul(G, Vi[i + 1][:, :, None])[:, :, 0]
+        # [adV]^T P, with V = (w, v) and P = (pw, pv)
+        w, v = Vi[i + 1][:, 0: 3], Vi[i + 1][:, 3: 6]
+        adVTP = -np.c_[np.cross(w, P[:, 0: 3]) + np.cross(v, P[:, 3: 6]), \
+                       np.cross(w, P[:, 3: 6])]
+        Fi = np.matmul(np.swapaxes(AdTi[i + 1], -1, -2), \
+                       Fi[:, :, None])[:, :, 0] \
+             + np.matmul(G, Vdi[i + 1][:, :, None])[:, :, 0] - adVTP
+        taumat[:, i] = np.sum(Fi * Ai[i], axis=1)
+    return taumat
+
 def MassMatrix(thetalist, Mlist, Glist, Slist):
     """Computes the mass matrix of an open chain robot based on the given
     configuration
@@ -991,6 +2249,90 @@ def MassMatrix(thetalist, Mlist, Glist, Slist):
                                   Glist, Slist)
     return M
 
+def _MassMatrixCRBA(AdTi, Alist, Glist):
+    """Assembles the mass matrix with the composite rigid body algorithm
+
+    :param AdTi: The n+1 link adjoints [Ad_T(i,i-1)] at the configuration
+    :param Alist: Screw axes Ai of the joints in their link frames, as
+                  columns
+    :param Glist: Spatial inertia matrices Gi of the links
+    :return: The numerical inertia matrix
+    """
+    n = Alist.shape[1]
+    Ic = np.array(Glist, dtype=float)
+    for i in range(n - 2, -1, -1):
+        Ic[i] = Ic[i] + np.dot(AdTi[i + 1].T, np.dot(Ic[i + 1], AdTi[i + 1]))
+    M = np.zeros((n, n))
+    for i in range(n):
+        Fi = np.dot(Ic[i], Alist[:, i])
+        M[i, i] = np.dot(Alist[:, i], Fi)
+        for j in range(i - 1, -1, -1):
+            Fi = np.dot(AdTi[j + 1].T, Fi)
+            M[i, j] = M[j, i] = np.dot(Alist[:, j], Fi)
+    return M
+
+def MassMatrixCRBA(thetalist, Mlist, Glist, Slist):
+    """Computes the mass matrix of an open chain robot based on the given
+    configuration, using the composite rigid body algorithm
+
+    :param thetalist: A list of joint variables
+    :param Mlist: List of link frames i relative to i-1 at the home position
+    :param Glist: Spatial inertia matrices Gi of the links
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :return: The numerical inertia matrix M(thetalist) of an n-joint serial
+             chain at the given configuration thetalist
+    Returns the same matrix as MassMatrix. The link frames are propagated
+    once, the inertia of each link and everything outboard of it is
+    accumulated from the tip inwards, and entry (i, j) is the projection of
+    the composite inertia of link i moved along joint i onto joint j,
+    instead of running n full Newton-Euler passes.
+
+    Example Input (3 Link Robot):
+        thetalist = np.array([0.1, 0.1, 0.1])
+        M01 = np.array([[1, 0, 0,        0],
+                        [0, 1, 0,        0],
+                        [0, 0, 1, 0.089159],
+                        [0, 0, 0,        1]])
+        M12 = np.array([[ 0, 0, 1,    0.28],
+                        [ 0, 1, 0, 0.13585],
+                        [-1, 0, 0,       0],
+                        [ 0, 0, 0,       1]])
+        M23 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0, -0.1197],
+                        [0, 0, 1,   0.395],
+                        [0, 0, 0,       1]])
+        M34 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0,       0],
+                        [0, 0, 1, 0.14225],
+                        [0, 0, 0,       1]])
+        G1 = np.diag([0.010267, 0.010267, 0.00666, 3.7, 3.7, 3.7])
+        G2 = np.diag([0.22689, 0.22689, 0.0151074, 8.393, 8.393, 8.393])
+        G3 = np.diag([0.0494433, 0.0494433, 0.004095, 2.275, 2.275, 2.275])
+        Glist = np.array([G1, G2, G3])
+        Mlist = np.array([M01, M12, M23, M34])
+        Slist = np.array([[1, 0, 1,      0, 1,     0],
+                          [0, 1, 0, -0.089, 0,     0],
+                          [0, 1, 0, -0.089, 0, 0.425]]).T
+    Output:
+        np.array([[ 2.25433380e+01, -3.07146754e-01, -7.18426391e-03],
+                  [-3.07146754e-01,  1.96850717e+00,  4.32157368e-01],
+                  [-7.18426391e-03,  4.32157368e-01,  1.91630858e-01]])
+    """
+    thetalist = np.asarray(thetalist, dtype=float)
+    Mlist = np.asarray(Mlist, dtype=float)
+    Slist = np.asarray(Slist, dtype=float)
+    n = len(thetalist)
+    Mi = np.eye(4)
+    Alist = np.zeros((6, n))
+    for i in range(n):
+        Mi = np.dot(Mi, Mlist[i])
+        Alist[:, i] = np.dot(Adjoint(TransInv(Mi)), Slist[:, i])
+    AdTi = np.matmul(AdjointBatch(MatrixExp6Batch(Alist.T \
+                                                  * -thetalist[:, None])), \
+                     AdjointBatch(TransInvBatch(Mlist[: n])))
+    return _MassMatrixCRBA(AdTi, Alist, Glist)
+
 def VelQuadraticForces(thetalist, dthetalist, Mlist, Glist, Slist):
     """Computes the Coriolis and centripetal terms in the inverse dynamics of
     an open chain robot
@@ -1191,8 +2533,8 @@ def ForwardDynamics(thetalist, dthetalist, taulist, g, Ftip, Mlist, \
     Output:
         np.array([-0.97392907, 25.58466784, -32.91499212])
     """
-    return np.dot(np.linalg.inv(MassMatrix(thetalist, Mlist, Glist, \
-                                           Slist)), \
+    return np.dot(np.linalg.inv(MassMatrixCRBA(thetalist, Mlist, Glist, \
+                                               Slist)), \
                   np.array(taulist) \
                   - VelQuadraticForces(thetalist, dthetalist, Mlist, \
                                        Glist, Slist) \
@@ -1200,6 +2542,183 @@ def ForwardDynamics(thetalist, dthetalist, taulist, g, Ftip, Mlist, \
                   - EndEffectorForces(thetalist, Ftip, Mlist, Glist, \
                                       Slist))
 
+def _ForwardDynamicsABA(AdTi, Alist, Glist, dthetalist, taulist, g, Ftip):
+    """Computes joint accelerations with the articulated body algorithm
+
+    :param AdTi: The n+1 link adjoints [Ad_T(i,i-1)] at the configuration
+    :param Alist: Screw axes Ai of the joints in their link frames, as
+                  columns
+    :param Glist: Spatial inertia matrices Gi of the links
+    :param dthetalist: n-vector of joint rates
+    :param taulist: An n-vector of joint forces/torques
+    :param g: Gravity vector g
+    :param Ftip: Spatial force applied by the end-effector expressed in frame
+                 {n+1}
+    :return: The resulting joint accelerations
+    """
+    n = Alist.shape[1]
+    Vi = np.zeros(6)
+    ci = np.zeros((n, 6))
+    IA = np.array(Glist, dtype=float)
+    pA = np.zeros((n, 6))
+    for i in range(n):
+        Vi = np.dot(AdTi[i], Vi) + Alist[:, i] * dthetalist[i]
+        adV = ad(Vi)
+        ci[i] = np.dot(adV, Alist[:, i]) * dthetalist[i]
+        pA[i] = -np.dot(adV.T, np.dot(Glist[i], Vi))
+    pA[n - 1] = pA[n - 1] + np.dot(AdTi[n].T, Ftip)
+    U = np.zeros((n, 6))
+    D = np.zeros(n)
+    u = np.zeros(n)
+    for i in range(n - 1, -1, -1):
+        U[i] = np.dot(IA[i], Alist[:, i])
+        D[i] = np.dot(Alist[:, i], U[i])
+        u[i] = taulist[i] - np.dot(Alist[:, i], pA[i])
+        if i > 0:
+            Ia = IA[i] - np.outer(U[i], U[i]) / D[i]
+            pa = pA[i] + np.dot(Ia, ci[i]) + U[i] * u[i] / D[i]
+            IA[i - 1] = IA[i - 1] + np.dot(AdTi[i].T, np.dot(Ia, AdTi[i]))
+            pA[i - 1] = pA[i - 1] + np.dot(AdTi[i].T, pa)
+    ddthetalist = np.zeros(n)
+    ai = np.r_[[0, 0, 0], -np.asarray(g, dtype=float)]
+    for i in range(n):
+        ai = np.dot(AdTi[i], ai) + ci[i]
+        ddthetalist[i] = (u[i] - np.dot(U[i], ai)) / D[i]
+        ai = ai + Alist[:, i] * ddthetalist[i]
+    return ddthetalist
+
+def ForwardDynamicsABA(thetalist, dthetalist, taulist, g, Ftip, Mlist, \
+                       Glist, Slist, validate=False):
+    """Computes forward dynamics in the space frame for an open chain robot
+    using the articulated body algorithm
+
+    :param thetalist: A list of joint variables
+    :param dthetalist: A list of joint rates
+    :param taulist: An n-vector of joint forces/torques
+    :param g: Gravity vector g
+    :param Ftip: Spatial force applied by the end-effector expressed in frame
+                 {n+1}
+    :param Mlist: List of link frames i relative to i-1 at the home position
+    :param Glist: Spatial inertia matrices Gi of the links
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :param validate: If True, the result is compared against ForwardDynamics
+                     and, if the two disagree or the result is not finite,
+                     a warning is issued and the ForwardDynamics result is
+                     returned instead
+    :return: The resulting joint accelerations
+    Returns the same accelerations as ForwardDynamics in O(n) operations: the
+    articulated inertia of each subtree is accumulated from the tip inwards,
+    and the accelerations are then resolved joint by joint from the base
+    outwards, without forming or inverting the mass matrix.
+
+    Example Input (3 Link Robot):
+        thetalist = np.array([0.1, 0.1, 0.1])
+        dthetalist = np.array([0.1, 0.2, 0.3])
+        taulist = np.array([0.5, 0.6, 0.7])
+        g = np.array([0, 0, -9.8])
+        Ftip = np.array([1, 1, 1, 1, 1, 1])
+        M01 = np.array([[1, 0, 0,        0],
+                        [0, 1, 0,        0],
+                        [0, 0, 1, 0.089159],
+                        [0, 0, 0,        1]])
+        M12 = np.array([[ 0, 0, 1,    0.28],
+                        [ 0, 1, 0, 0.13585],
+                        [-1, 0, 0,       0],
+                        [ 0, 0, 0,       1]])
+        M23 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0, -0.1197],
+                        [0, 0, 1,   0.395],
+                        [0, 0, 0,       1]])
+        M34 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0,       0],
+                        [0, 0, 1, 0.14225],
+                        [0, 0, 0,       1]])
+        G1 = np.diag([0.010267, 0.010267, 0.00666, 3.7, 3.7, 3.7])
+        G2 = np.diag([0.22689, 0.22689, 0.0151074, 8.393, 8.393, 8.393])
+        G3 = np.diag([0.0494433, 0.0494433, 0.004095, 2.275, 2.275, 2.275])
+        Glist = np.array([G1, G2, G3])
+        Mlist = np.array([M01, M12, M23, M34])
+        Slist = np.array([[1, 0, 1,      0, 1,     0],
+                          [0, 1, 0, -0.089, 0,     0],
+                          [0, 1, 0, -0.089, 0, 0.425]]).T
+    Output:
+        np.array([-0.97392907, 25.58466784, -32.91499212])
+    """
+    thetalist = np.asarray(thetalist, dtype=float)
+    Mlist = np.asarray(Mlist, dtype=float)
+    Slist = np.asarray(Slist, dtype=float)
+    n = len(thetalist)
+    Mi = np.eye(4)
+    Alist = np.zeros((6, n))
+    for i in range(n):
+        Mi = np.dot(Mi, Mlist[i])
+        Alist[:, i] = np.dot(Adjoint(TransInv(Mi)), Slist[:, i])
+    AdTi = AdjointBatch(TransInvBatch(Mlist))
+    exps = MatrixExp6Batch(Alist.T * -thetalist[:, None])
+    AdTi[: n] = np.matmul(AdjointBatch(exps), AdTi[: n])
+    ddthetalist = _ForwardDynamicsABA(AdTi, Alist, Glist, dthetalist, \
+                                      taulist, g, np.asarray(Ftip, dtype=float))
+    if validate:
+        reference = ForwardDynamics(thetalist, dthetalist, taulist, g, Ftip, \
+                                    Mlist, Glist, Slist)
+        if not np.allclose(ddthetalist, reference, rtol=1e-6, atol=1e-8):
+            warnings.warn('ForwardDynamicsABA disagrees with ForwardDynamics;'
+                          ' returning the ForwardDynamics result')
+            return reference
+    return ddthetalist
+
+def ForwardDynamicsBatch(thetamat, dthetamat, taumat, g, Ftipmat, Mlist, \
+                         Glist, Slist):
+    """Computes forward dynamics in the space frame for many joint states at
+    once
+
+    :param thetamat: An N x n matrix of joint variables
+    :param dthetamat: An N x n matrix of joint rates
+    :param taumat: An N x n matrix of joint forces/torques
+    :param g: Gravity vector g, or an N x 3 matrix of gravity vectors
+    :param Ftipmat: A spatial force applied by the end-effector expressed in
+                    frame {n+1}, or an N x 6 matrix of such forces (a scalar
+                    0 means no tip force)
+    :param Mlist: List of link frames i relative to i-1 at the home position,
+                  with shape (n+1, 4, 4) or (N, n+1, 4, 4)
+    :param Glist: Spatial inertia matrices Gi of the links, with shape
+                  (n, 6, 6) or (N, n, 6, 6)
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :return: The N x n matrix of resulting joint accelerations
+    The bias forces and the n columns of every mass matrix are obtained from
+    InverseDynamicsBatch calls covering all rows at once, and the N mass
+    matrix systems are solved together.
+
+    Example Input (3 Link Robot):
+        thetamat = np.array([[0.1, 0.1, 0.1]])
+        dthetamat = np.array([[0.1, 0.2, 0.3]])
+        taumat = np.array([[0.5, 0.6, 0.7]])
+        g = np.array([0, 0, -9.8])
+        Ftipmat = np.array([1, 1, 1, 1, 1, 1])
+        (Mlist, Glist and Slist as in ForwardDynamics)
+    Output:
+        np.array([[-0.97392907, 25.58466784, -32.91499212]])
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    Mlist = np.asarray(Mlist, dtype=float)
+    Glist = np.asarray(Glist, dtype=float)
+    N, n = thetamat.shape
+    bias = InverseDynamicsBatch(thetamat, dthetamat, np.zeros((N, n)), g, \
+                                Ftipmat, Mlist, Glist, Slist)
+    if Mlist.ndim == 4:
+        Mlist = np.repeat(Mlist, n, axis=0)
+    if Glist.ndim == 4:
+        Glist = np.repeat(Glist, n, axis=0)
+    # Row k * n + j holds column j of the mass matrix of row k
+    Mmat = InverseDynamicsBatch(np.repeat(thetamat, n, axis=0), \
+                                np.zeros((N * n, n)), \
+                                np.tile(np.eye(n), (N, 1)), np.zeros(3), 0, \
+                                Mlist, Glist, Slist).reshape(N, n, n)
+    return np.linalg.solve(np.swapaxes(Mmat, 1, 2), \
+                           (np.asarray(taumat) - bias)[:, :, None])[:, :, 0]
+
 def EulerStep(thetalist, dthetalist, ddthetalist, dt):
     """Compute the joint angles and velocities at the next timestep using            from here
     first order Euler integration
@@ -1227,6 +2746,185 @@ def EulerStep(thetalist, dthetalist, ddthetalist, dt):
     return thetalist + dt * np.array(dthetalist), \
            dthetalist + dt * np.array(ddthetalist)
 
+def SemiImplicitEulerStep(thetalist, dthetalist, ddthetalist, dt):
+    """Compute the joint angles and velocities at the next timestep using
+    semi-implicit (symplectic) Euler integration
+
+    :param thetalist: n-vector of joint variables
+    :param dthetalist: n-vector of joint rates
+    :param ddthetalist: n-vector of joint accelerations
+    :param dt: The timestep delta t
+    :return thetalistNext: Vector of joint variables after dt
+    :return dthetalistNext: Vector of joint rates after dt
+    The joint rates are updated first and the updated rates are used to
+    advance the joint variables, which keeps the energy of undamped motion
+    bounded at the same cost as EulerStep.
+
+    Example Inputs (3 Link Robot):
+        thetalist = np.array([0.1, 0.1, 0.1])
+        dthetalist = np.array([0.1, 0.2, 0.3])
+        ddthetalist = np.array([2, 1.5, 1])
+        dt = 0.1
+    Output:
+        thetalistNext:
+        array([ 0.13 ,  0.135,  0.14 ])
+        dthetalistNext:
+        array([ 0.3 ,  0.35,  0.4 ])
+    """
+    dthetalistNext = dthetalist + dt * np.array(ddthetalist)
+    return thetalist + dt * dthetalistNext, dthetalistNext
+
+def RK4Step(thetalist, dthetalist, accel, dt):
+    """Compute the joint angles and velocities at the next timestep using
+    fourth order Runge-Kutta integration
+
+    :param thetalist: n-vector of joint variables
+    :param dthetalist: n-vector of joint rates
+    :param accel: A function returning the n-vector of joint accelerations
+                  for given joint variables and rates, e.g. a wrapper around
+                  ForwardDynamics
+    :param dt: The timestep delta t
+    :return thetalistNext: Vector of joint variables after dt
+    :return dthetalistNext: Vector of joint rates after dt
+    Calls accel four times.
+
+    Example Inputs (Undamped pendulum):
+        thetalist = np.array([0.1])
+        dthetalist = np.array([0])
+        accel = lambda theta, dtheta: -9.8 * np.sin(theta)
+        dt = 0.1
+    Output:
+        thetalistNext:
+        array([ 0.09514792])
+        dthetalistNext:
+        array([-0.09624644])
+    """
+    thetalist = np.asarray(thetalist, dtype=float)
+    dthetalist = np.asarray(dthetalist, dtype=float)
+    k1 = accel(thetalist, dthetalist)
+    d2 = dthetalist + 0.5 * dt * k1
+    k2 = accel(thetalist + 0.5 * dt * dthetalist, d2)
+    d3 = dthetalist + 0.5 * dt * k2
+    k3 = accel(thetalist + 0.5 * dt * d2, d3)
+    d4 = dthetalist + dt * k3
+    k4 = accel(thetalist + dt * d3, d4)
+    return thetalist + dt / 6.0 * (dthetalist + 2 * d2 + 2 * d3 + d4), \
+           dthetalist + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+# Dormand-Prince 5(4) coefficients
+_DP_A = [np.array([1 / 5.0]),
+         np.array([3 / 40.0, 9 / 40.0]),
+         np.array([44 / 45.0, -56 / 15.0, 32 / 9.0]),
+         np.array([19372 / 6561.0, -25360 / 2187.0, 64448 / 6561.0, \
+                   -212 / 729.0]),
+         np.array([9017 / 3168.0, -355 / 33.0, 46732 / 5247.0, 49 / 176.0, \
+                   -5103 / 18656.0]),
+         np.array([35 / 384.0, 0, 500 / 1113.0, 125 / 192.0, \
+                   -2187 / 6784.0, 11 / 84.0])]
+_DP_E = np.array([71 / 57600.0, 0, -71 / 16695.0, 71 / 1920.0, \
+                  -17253 / 339200.0, 22 / 525.0, -1 / 40.0])
+
+def RK45Step(thetalist, dthetalist, accel, dt, tol=1e-6, h=None):
+    """Compute the joint angles and velocities at the next timestep using
+    adaptive Runge-Kutta (Dormand-Prince 5(4)) integration
+
+    :param thetalist: n-vector of joint variables, or a B x n matrix for B
+                      independent systems stepped together
+    :param dthetalist: n-vector (or B x n matrix) of joint rates
+    :param accel: A function returning the n-vector (or B x n matrix) of
+                  joint accelerations for given joint variables and rates
+    :param dt: The timestep delta t
+    :param tol: The error tolerance per substep, relative to the size of the
+                state (absolute for components smaller than one)
+    :param h: An optional initial substep size, e.g. the value returned by
+              the previous call. Defaults to dt
+    :return thetalistNext: Vector of joint variables after dt
+    :return dthetalistNext: Vector of joint rates after dt
+    :return hNext: The substep size to start the next interval with
+    Raises ValueError if accel returns a non-finite value or the substep
+    shrinks below 1e-12 * dt, so that a diverging simulation fails instead
+    of stalling.
+    The interval dt is covered with as many substeps as the error estimate
+    requires: smooth motion is integrated in one or a few large steps, and
+    the step shrinks only where the dynamics are fast.
+
+    Example Inputs (Undamped pendulum):
+        thetalist = np.array([0.1])
+        dthetalist = np.array([0])
+        accel = lambda theta, dtheta: -9.8 * np.sin(theta)
+        dt = 0.1
+    Output:
+        thetalistNext:
+        array([ 0.09514776])
+        dthetalistNext:
+        array([-0.09625426])
+        hNext:
+        0.09535588
+    """
+    n = np.shape(thetalist)[-1]
+    f = lambda y: np.concatenate((y[..., n:], \
+                                  accel(y[..., : n], y[..., n:])), axis=-1)
+    y = np.concatenate((np.asarray(thetalist, dtype=float), \
+                        np.asarray(dthetalist, dtype=float)), axis=-1)
+    h = dt if h is None else min(h, dt)
+    t = 0.0
+    k = np.zeros((7,) + y.shape)
+    k[0] = f(y)
+    while dt - t > 1e-12 * dt:
+        hstep = min(h, dt - t)
+        for i in range(6):
+            k[i + 1] = f(y + hstep * np.tensordot(_DP_A[i], k[: i + 1], 1))
+        ynext = y + hstep * np.tensordot(_DP_A[5], k[: 6], 1)
+        err = hstep * np.tensordot(_DP_E, k, 1)
+        scale = tol * np.maximum(1.0, np.maximum(np.abs(y), np.abs(ynext)))
+        errnorm = np.max(np.abs(err) / scale)
+        if not np.isfinite(errnorm):
+            raise ValueError("RK45Step: the state or its derivative is not " \
+                             "finite; the simulation has diverged")
+        if errnorm <= 1:
+            t = t + hstep
+            y = ynext
+            k[0] = k[6]
+        if errnorm == 0:
+            h = 5 * hstep
+        else:
+            h = hstep * min(5.0, max(0.2, 0.9 * errnorm ** -0.2))
+        if h < 1e-12 * dt:
+            raise ValueError("RK45Step: the substep fell below 1e-12 * dt " \
+                             "without meeting the tolerance")
+    return y[..., : n], y[..., n:], h
+
+def _IntegrateInterval(thetalist, dthetalist, accel, dt, intRes, \
+                       integrator, h=None):
+    """Advances the joint state over one interval dt
+
+    :param integrator: 'euler', 'semi-implicit', 'rk4' or 'rk45'. The fixed
+                       step methods take intRes steps of dt / intRes; 'rk45'
+                       chooses its own substeps, starting from h (or
+                       dt / intRes)
+    :return: The joint variables, joint rates and the substep size to pass
+             as h for the next interval
+    """
+    if integrator == 'rk45':
+        return RK45Step(thetalist, dthetalist, accel, dt, \
+                        h=1.0 * dt / intRes if h is None else h)
+    step = 1.0 * dt / intRes
+    for j in range(intRes):
+        if integrator == 'euler':
+            thetalist, dthetalist \
+            = EulerStep(thetalist, dthetalist, \
+                        accel(thetalist, dthetalist), step)
+        elif integrator == 'semi-implicit':
+            thetalist, dthetalist \
+            = SemiImplicitEulerStep(thetalist, dthetalist, \
+                                    accel(thetalist, dthetalist), step)
+        elif integrator == 'rk4':
+            thetalist, dthetalist \
+            = RK4Step(thetalist, dthetalist, accel, step)
+        else:
+            raise ValueError("Unknown integrator: %s" % integrator)
+    return thetalist, dthetalist, h
+
 def InverseDynamicsTrajectory(thetamat, dthetamat, ddthetamat, g, \
                               Ftipmat, Mlist, Glist, Slist):
     """Calculates the joint forces/torques required to move the serial chain
@@ -1316,21 +3014,12 @@ def InverseDynamicsTrajectory(thetamat, dthetamat, ddthetamat, g, \
             plt.title("Plot of Torque Trajectories")
             plt.show()
     """
-    thetamat = np.array(thetamat).T
-    dthetamat = np.array(dthetamat).T
-    ddthetamat = np.array(ddthetamat).T
-    Ftipmat = np.array(Ftipmat).T
-    taumat = np.array(thetamat).copy()
-    for i in range(np.array(thetamat).shape[1]):
-        taumat[:, i] \
-        = InverseDynamics(thetamat[:, i], dthetamat[:, i], \
-                          ddthetamat[:, i], g, Ftipmat[:, i], Mlist, \
-                          Glist, Slist)
-    taumat = np.array(taumat).T
-    return taumat
+    return InverseDynamicsBatch(thetamat, dthetamat, ddthetamat, g, \
+                                Ftipmat, Mlist, Glist, Slist)
 
 def ForwardDynamicsTrajectory(thetalist, dthetalist, taumat, g, Ftipmat, \
-                              Mlist, Glist, Slist, dt, intRes):
+                              Mlist, Glist, Slist, dt, intRes, \
+                              integrator='euler'):
     """Simulates the motion of a serial chain given an open-loop history of
     joint forces/torques
 
@@ -1351,6 +3040,10 @@ def ForwardDynamicsTrajectory(thetalist, dthetalist, taumat, g, Ftipmat, \
     :param intRes: Integration resolution is the number of times integration
                    (Euler) takes places between each time step. Must be an
                    integer value greater than or equal to 1
+    :param integrator: The integration method: 'euler' (EulerStep, the
+                       default), 'semi-implicit' (SemiImplicitEulerStep),
+                       'rk4' (RK4Step) or 'rk45' (RK45Step, which picks its
+                       own substeps and uses intRes only for the first one)
     :return thetamat: The N x n matrix of robot joint angles resulting from
                       the specified joint forces/torques
     :return dthetamat: The N x n matrix of robot joint velocities
@@ -1435,13 +3128,14 @@ def ForwardDynamicsTrajectory(thetalist, dthetalist, taumat, g, Ftipmat, \
     thetamat[:, 0] = thetalist
     dthetamat = taumat.copy().astype(float)
     dthetamat[:, 0] = dthetalist
+    h = None
     for i in range(np.array(taumat).shape[1] - 1):
-        for j in range(intRes):
-            ddthetalist \
-            = ForwardDynamics(thetalist, dthetalist, taumat[:, i], g, \
-                              Ftipmat[:, i], Mlist, Glist, Slist)
-            thetalist,dthetalist = EulerStep(thetalist, dthetalist, \
-                                             ddthetalist, 1.0 * dt / intRes)
+        accel = lambda theta, dtheta: \
+                ForwardDynamicsABA(theta, dtheta, taumat[:, i], g, \
+                                   Ftipmat[:, i], Mlist, Glist, Slist)
+        thetalist, dthetalist, h \
+        = _IntegrateInterval(thetalist, dthetalist, accel, dt, intRes, \
+                             integrator, h)
         thetamat[:, i + 1] = thetalist
         dthetamat[:, i + 1] = dthetalist
     thetamat = np.array(thetamat).T
@@ -1478,25 +3172,335 @@ def QuinticTimeScaling(Tf, t):
              acceleration
 
     Example Input:
-        Tf = 2
-        t = 0.6
+        Tf = 2
+        t = 0.6
+    Output:
+        0.16308
+    """
+    return 10 * (1.0 * t / Tf) ** 3 - 15 * (1.0 * t / Tf) ** 4 \
+           + 6 * (1.0 * t / Tf) ** 5
+
+def CubicTimeScalingDerivatives(Tf, t):
+    """Computes s(t) and its first and second time derivatives for a cubic
+    time scaling
+
+    :param Tf: Total time of the motion in seconds from rest to rest
+    :param t: The current time t satisfying 0 < t < Tf, or an array of times
+    :return s: The path parameter s(t), as CubicTimeScaling
+    :return sdot: The path velocity ds/dt
+    :return sddot: The path acceleration d2s/dt2
+    All three are arrays of the shape of t when t is an array.
+
+    Example Input:
+        Tf = 2
+        t = np.array([0, 0.6, 1])
+    Output:
+        (np.array([0, 0.216, 0.5]),
+         np.array([0, 0.63, 0.75]),
+         np.array([1.5, 0.6, 0]))
+    """
+    u = np.asarray(t, dtype=float) / Tf
+    return 3 * u ** 2 - 2 * u ** 3, \
+           (6 * u - 6 * u ** 2) / Tf, \
+           (6 - 12 * u) / Tf ** 2
+
+def QuinticTimeScalingDerivatives(Tf, t):
+    """Computes s(t) and its first and second time derivatives for a quintic
+    time scaling
+
+    :param Tf: Total time of the motion in seconds from rest to rest
+    :param t: The current time t satisfying 0 < t < Tf, or an array of times
+    :return s: The path parameter s(t), as QuinticTimeScaling
+    :return sdot: The path velocity ds/dt
+    :return sddot: The path acceleration d2s/dt2
+    All three are arrays of the shape of t when t is an array.
+
+    Example Input:
+        Tf = 2
+        t = np.array([0, 0.6, 1])
+    Output:
+        (np.array([0, 0.16308, 0.5]),
+         np.array([0, 0.6615, 0.9375]),
+         np.array([0, 1.26, 0]))
+    """
+    u = np.asarray(t, dtype=float) / Tf
+    return 10 * u ** 3 - 15 * u ** 4 + 6 * u ** 5, \
+           (30 * u ** 2 - 60 * u ** 3 + 30 * u ** 4) / Tf, \
+           (60 * u - 180 * u ** 2 + 120 * u ** 3) / Tf ** 2
+
+def _LimitedProfile(Tf, vmax, amax, jmax):
+    """Computes the symmetric jerk-limited profile that moves the path
+    parameter s from 0 to 1 in Tf seconds, or in the minimum time if Tf is
+    None, under limits on ds/dt, d2s/dt2 and d3s/dt3 (np.inf for none)
+
+    :return: (Tf, Tj, Ta, v), where Tj is the duration of each constant-jerk
+             phase, Ta that of the constant-acceleration phase while speeding
+             up (and mirrored while slowing down) and v the cruise speed
+    Raises ValueError if Tf is shorter than the minimum time.
+    """
+    ramp = 0.0 if np.isinf(jmax) else 1.0 * amax / jmax
+
+    def accel_phases(v):
+        if ramp == 0 or v >= amax * ramp:
+            return ramp, v / amax - ramp
+        return np.sqrt(v / jmax), 0.0
+
+    def duration(v):
+        Tj, Ta = accel_phases(v)
+        return 1.0 / v + 2 * Tj + Ta
+
+    # Fastest cruise speed for which speeding up and slowing down fit in s
+    with np.errstate(divide='ignore'):
+        v = 2.0 / (ramp + np.sqrt(ramp ** 2 + 4.0 / amax))
+    if ramp != 0 and v < amax * ramp:
+        v = (jmax / 4.0) ** (1.0 / 3)
+    v = min(vmax, v)
+    Tmin = 0.0 if np.isinf(v) else duration(v)
+    if Tf is None:
+        Tf = Tmin
+    elif Tf < Tmin * (1 - 1e-9):
+        raise ValueError("Tf = %g is shorter than the minimum time %g " \
+                         "allowed by the limits" % (Tf, Tmin))
+    elif Tf > Tmin:
+        # Slower cruise speed that stretches the motion to Tf
+        lo, hi = 0.0, v if not np.isinf(v) else 2.0 / Tf
+        for _ in range(100):
+            mid = 0.5 * (lo + hi)
+            if duration(mid) > Tf:
+                lo = mid
+            else:
+                hi = mid
+        v = hi
+    if np.isinf(v):
+        # No motion at all: the profile stays at its end
+        return Tf, 0.0, 0.0, 0.0
+    Tj, Ta = accel_phases(v)
+    return Tf, Tj, Ta, v
+
+def _LimitedTimeScalingDerivatives(profile, t):
+    """Evaluates s(t), ds/dt and d2s/dt2 of a profile from _LimitedProfile
+    at the times t (scalar or array)
+    """
+    Tf, Tj, Ta, v = profile
+    t = np.clip(np.asarray(t, dtype=float), 0, Tf)
+    Tacc = 2 * Tj + Ta
+    ap = v / (Tj + Ta) if Tj + Ta > 0 else 0.0
+    jj = ap / Tj if Tj > 0 else 0.0
+
+    def accel(tau):
+        tb = tau - Tj
+        u = Tacc - tau
+        first = tau <= Tj
+        second = tau <= Tj + Ta
+        s = np.where(first, jj * tau ** 3 / 6, \
+            np.where(second, ap * Tj ** 2 / 6 + ap * Tj / 2 * tb \
+                             + ap * tb ** 2 / 2, \
+                     v * Tacc / 2 - v * u + jj * u ** 3 / 6))
+        sdot = np.where(first, jj * tau ** 2 / 2, \
+               np.where(second, ap * Tj / 2 + ap * tb, v - jj * u ** 2 / 2))
+        sddot = np.where(first, jj * tau, np.where(second, ap, jj * u))
+        return s, sdot, sddot
+
+    sa, va, aa = accel(t)
+    sd, vd, ad = accel(Tf - t)
+    speeding = t <= Tacc
+    slowing = t >= Tf - Tacc
+    with np.errstate(invalid='ignore'):
+        cruise = v * Tacc / 2 + v * (t - Tacc)
+    return np.where(speeding, sa, np.where(slowing, 1 - sd, cruise)), \
+           np.where(speeding, va, np.where(slowing, vd, v)), \
+           np.where(speeding, aa, np.where(slowing, -ad, 0.0))
+
+def TrapezoidalTimeScaling(Tf, t, vmax, amax):
+    """Computes s(t) for a trapezoidal velocity time scaling
+
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits
+    :param t: The current time t satisfying 0 < t < Tf, or an array of times
+    :param vmax: The maximum path velocity ds/dt
+    :param amax: The maximum path acceleration d2s/dt2
+    :return: The path parameter s(t) corresponding to constant acceleration
+             amax, cruising, and constant deceleration amax. A Tf longer than
+             the minimum time lowers the cruise velocity. Raises ValueError
+             if Tf is shorter than the minimum time
+
+    Example Input:
+        Tf = 2
+        t = 0.6
+        vmax = 1
+        amax = 2
+    Output:
+        0.26569
+    """
+    return _LimitedTimeScalingDerivatives( \
+           _LimitedProfile(Tf, vmax, amax, np.inf), t)[0]
+
+def SCurveTimeScaling(Tf, t, vmax, amax, jmax):
+    """Computes s(t) for a jerk-limited (S-curve) time scaling
+
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits
+    :param t: The current time t satisfying 0 < t < Tf, or an array of times
+    :param vmax: The maximum path velocity ds/dt
+    :param amax: The maximum path acceleration d2s/dt2
+    :param jmax: The maximum path jerk d3s/dt3
+    :return: The path parameter s(t) of the seven-phase profile in which the
+             acceleration ramps at jmax up to at most amax and back down to
+             zero, cruises, and mirrors this to stop. A Tf longer than the
+             minimum time lowers the cruise velocity. Raises ValueError if Tf
+             is shorter than the minimum time
+
+    Example Input:
+        Tf = 2
+        t = 0.6
+        vmax = 1
+        amax = 2
+        jmax = 10
+    Output:
+        0.22542
+    """
+    return _LimitedTimeScalingDerivatives( \
+           _LimitedProfile(Tf, vmax, amax, jmax), t)[0]
+
+def _PathLimits(lengths, method, limits):
+    """Converts limits on the motion along a path whose components (joints,
+    or rotation and translation) have the given total lengths into limits
+    on the path parameter s, as (vmax, amax, jmax)
+    """
+    if method != 'trapezoidal' and method != 'scurve':
+        raise ValueError("Unknown time-scaling method: %r" % (method,))
+    if limits is None or len(limits) != (2 if method == 'trapezoidal' else 3):
+        raise ValueError("The %s method requires limits (vmax, amax%s)" \
+                         % (method, ", jmax" if method == 'scurve' else ""))
+    lengths = np.abs(np.asarray(lengths, dtype=float))
+    slimits = [np.inf, np.inf, np.inf]
+    for i, limit in enumerate(limits):
+        with np.errstate(divide='ignore'):
+            ratio = np.broadcast_to(limit, lengths.shape) / lengths
+        slimits[i] = np.min(ratio) if ratio.size else np.inf
+    return tuple(slimits)
+
+def _PathTimeScaling(Tf, N, method, lengths, limits):
+    """Computes s, ds/dt and d2s/dt2 at N equally spaced times over a motion
+    for any time-scaling method, the limited ones being applied to a path
+    with the given component lengths
+    """
+    if method == 3 or method == 5 or not isinstance(method, str):
+        t = np.linspace(0, Tf, N)
+        return _TimeScalingDerivatives(Tf, t, method)
+    profile = _LimitedProfile(Tf, *_PathLimits(lengths, method, limits))
+    return _LimitedTimeScalingDerivatives(profile, \
+                                          np.linspace(0, profile[0], N))
+
+def _SE3PathLengths(Xstart, Xend, screw):
+    """Rotation angle and translation length of the screw motion (screw =
+    True) or of the decoupled straight-line motion from Xstart to Xend
+    """
+    if screw:
+        expc6 = se3ToVec(MatrixLog6(np.dot(TransInv(Xstart), Xend)))
+        return np.array([np.linalg.norm(expc6[0: 3]), \
+                         np.linalg.norm(expc6[3: 6])])
+    Rstart, pstart = TransToRp(Xstart)
+    Rend, pend = TransToRp(Xend)
+    omg = so3ToVec(MatrixLog3(np.dot(np.array(Rstart).T, Rend)))
+    return np.array([np.linalg.norm(omg), \
+                     np.linalg.norm(np.array(pend) - np.array(pstart))])
+
+def JointTrajectoryMinimumTime(thetastart, thetaend, method, limits):
+    """Computes the shortest duration of a straight-line joint trajectory
+    under velocity, acceleration and jerk limits
+
+    :param thetastart: The initial joint variables
+    :param thetaend: The final joint variables
+    :param method: The time-scaling method, 'trapezoidal' or 'scurve'
+    :param limits: The joint limits (vmax, amax) for 'trapezoidal' or (vmax,
+                   amax, jmax) for 'scurve', each a scalar or an n-vector
+    :return: The minimum time Tf in seconds, as used by JointTrajectory when
+             given Tf = None
+
+    Example Input:
+        thetastart = np.array([0, 0])
+        thetaend = np.array([1, 2])
+        method = 'trapezoidal'
+        limits = (1, 2)
+    Output:
+        2.5
+    """
+    d = np.asarray(thetaend, dtype=float) - np.asarray(thetastart, dtype=float)
+    return _LimitedProfile(None, *_PathLimits(d, method, limits))[0]
+
+def ScrewTrajectoryMinimumTime(Xstart, Xend, method, limits):
+    """Computes the shortest duration of a screw trajectory under velocity,
+    acceleration and jerk limits
+
+    :param Xstart: The initial end-effector configuration
+    :param Xend: The final end-effector configuration
+    :param method: The time-scaling method, 'trapezoidal' or 'scurve'
+    :param limits: The limits (vmax, amax) for 'trapezoidal' or (vmax, amax,
+                   jmax) for 'scurve' on the angular and linear parts of the
+                   twist, each a scalar or a 2-vector (angular, linear)
+    :return: The minimum time Tf in seconds, as used by ScrewTrajectory when
+             given Tf = None
+
+    Example Input:
+        Xstart = np.eye(4)
+        Xend = np.array([[1, 0, 0, 0.5],
+                         [0, 1, 0,   0],
+                         [0, 0, 1,   0],
+                         [0, 0, 0,   1]])
+        method = 'trapezoidal'
+        limits = (1, 2)
+    Output:
+        1.0
+    """
+    return _LimitedProfile(None, *_PathLimits( \
+           _SE3PathLengths(Xstart, Xend, True), method, limits))[0]
+
+def CartesianTrajectoryMinimumTime(Xstart, Xend, method, limits):
+    """Computes the shortest duration of a Cartesian trajectory under
+    velocity, acceleration and jerk limits
+
+    :param Xstart: The initial end-effector configuration
+    :param Xend: The final end-effector configuration
+    :param method: The time-scaling method, 'trapezoidal' or 'scurve'
+    :param limits: The limits (vmax, amax) for 'trapezoidal' or (vmax, amax,
+                   jmax) for 'scurve' on the rotation and on the translation
+                   of the end-effector origin, each a scalar or a 2-vector
+                   (angular, linear)
+    :return: The minimum time Tf in seconds, as used by CartesianTrajectory
+             when given Tf = None
+
+    Example Input:
+        Xstart = np.eye(4)
+        Xend = np.array([[1, 0, 0, 0.5],
+                         [0, 1, 0,   0],
+                         [0, 0, 1,   0],
+                         [0, 0, 0,   1]])
+        method = 'trapezoidal'
+        limits = (1, 2)
     Output:
-        0.16308
+        1.0
     """
-    return 10 * (1.0 * t / Tf) ** 3 - 15 * (1.0 * t / Tf) ** 4 \
-           + 6 * (1.0 * t / Tf) ** 5
+    return _LimitedProfile(None, *_PathLimits( \
+           _SE3PathLengths(Xstart, Xend, False), method, limits))[0]
 
-def JointTrajectory(thetastart, thetaend, Tf, N, method):
+def JointTrajectory(thetastart, thetaend, Tf, N, method, limits=None):
     """Computes a straight-line trajectory in joint space
 
     :param thetastart: The initial joint variables
     :param thetaend: The final joint variables
-    :param Tf: Total time of the motion in seconds from rest to rest
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits of a 'trapezoidal'
+               or 'scurve' method
     :param N: The number of points N > 1 (Start and stop) in the discrete
               representation of the trajectory
     :param method: The time-scaling method, where 3 indicates cubic (third-
-                   order polynomial) time scaling and 5 indicates quintic
-                   (fifth-order polynomial) time scaling
+                   order polynomial) time scaling, 5 indicates quintic
+                   (fifth-order polynomial) time scaling, 'trapezoidal' a
+                   trapezoidal velocity profile and 'scurve' a jerk-limited
+                   velocity profile, the last two computed from limits
+    :param limits: The joint limits (vmax, amax) for 'trapezoidal' or (vmax,
+                   amax, jmax) for 'scurve', each a scalar or an n-vector
     :return: A trajectory as an N x n matrix, where each row is an n-vector
              of joint variables at an instant in time. The first row is
              thetastart and the Nth row is thetaend . The elapsed time
@@ -1517,29 +3521,356 @@ def JointTrajectory(thetastart, thetaend, Tf, N, method):
                   [   1.2,   0.5,    0.6,    1.1,     2,      2,    0.9, 1]])
     """
     N = int(N)
-    timegap = Tf / (N - 1.0)
-    traj = np.zeros((len(thetastart), N))
-    for i in range(N):
+    thetastart = np.array(thetastart)
+    thetaend = np.array(thetaend)
+    s = _PathTimeScaling(Tf, N, method, thetaend - thetastart, limits)[0]
+    return np.outer(s, thetaend) + np.outer(1 - s, thetastart)
+
+def JointTrajectoryDerivatives(thetastart, thetaend, Tf, N, method, \
+                               limits=None):
+    """Computes a straight-line trajectory in joint space together with its
+    joint velocities and accelerations
+
+    :param thetastart: The initial joint variables
+    :param thetaend: The final joint variables
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits of a 'trapezoidal'
+               or 'scurve' method
+    :param N: The number of points N > 1 (Start and stop) in the discrete
+              representation of the trajectory
+    :param method: The time-scaling method, where 3 indicates cubic (third-
+                   order polynomial) time scaling, 5 indicates quintic
+                   (fifth-order polynomial) time scaling, 'trapezoidal' a
+                   trapezoidal velocity profile and 'scurve' a jerk-limited
+                   velocity profile, the last two computed from limits
+    :param limits: The joint limits (vmax, amax) for 'trapezoidal' or (vmax,
+                   amax, jmax) for 'scurve', each a scalar or an n-vector
+    :return thetamat: The N x n matrix of joint variables, as JointTrajectory
+    :return dthetamat: The N x n matrix of exact joint velocities
+    :return ddthetamat: The N x n matrix of exact joint accelerations
+    The time scaling and its derivatives are evaluated analytically for all
+    N points at once, so the outputs can be passed directly to
+    InverseDynamicsTrajectory without numerical differentiation.
+
+    Example Input:
+        thetastart = np.array([0, 0])
+        thetaend = np.array([1, 2])
+        Tf = 2
+        N = 3
+        method = 5
+    Output:
+        (np.array([[  0,   0],
+                   [0.5,   1],
+                   [  1,   2]]),
+         np.array([[     0,     0],
+                   [0.9375, 1.875],
+                   [     0,     0]]),
+         np.array([[0, 0],
+                   [0, 0],
+                   [0, 0]]))
+    """
+    N = int(N)
+    thetastart = np.asarray(thetastart, dtype=float)
+    d = np.asarray(thetaend, dtype=float) - thetastart
+    s, sdot, sddot = _PathTimeScaling(Tf, N, method, d, limits)
+    return thetastart + np.outer(s, d), np.outer(sdot, d), \
+           np.outer(sddot, d)
+
+def _BlockTridiagonalSolve(L, D, U, b):
+    """Solves a block tridiagonal system by block Gaussian elimination
+    (the Thomas algorithm) in time linear in the number of block rows
+
+    :param L: The m x k x k sub-diagonal blocks (L[0] is unused)
+    :param D: The m x k x k diagonal blocks
+    :param U: The m x k x k super-diagonal blocks (U[m - 1] is unused)
+    :param b: The m x k x n right-hand sides
+    :return: The m x k x n solution x of L[i] x[i - 1] + D[i] x[i]
+             + U[i] x[i + 1] = b[i]
+    """
+    m = len(D)
+    Dp = np.array(D, dtype=float)
+    bp = np.array(b, dtype=float)
+    for i in range(1, m):
+        w = np.dot(L[i], np.linalg.inv(Dp[i - 1]))
+        Dp[i] = Dp[i] - np.dot(w, U[i - 1])
+        bp[i] = bp[i] - np.dot(w, bp[i - 1])
+    x = np.zeros_like(bp)
+    x[m - 1] = np.linalg.solve(Dp[m - 1], bp[m - 1])
+    for i in range(m - 2, -1, -1):
+        x[i] = np.linalg.solve(Dp[i], bp[i] - np.dot(U[i], x[i + 1]))
+    return x
+
+def JointSplineTrajectory(thetamat, tlist, N, method):
+    """Computes a smooth trajectory in joint space through a sequence of
+    waypoints without stopping at the intermediate ones
+
+    :param thetamat: An m x n matrix whose rows are the m >= 2 joint
+                     waypoints, in order
+    :param tlist: The m increasing times in seconds at which the waypoints
+                  are reached. The motion starts and ends at rest
+    :param N: The number of points N > 1 (Start and stop) in the discrete
+              representation of the trajectory
+    :param method: The spline order, where 3 indicates a cubic spline with
+                   continuous velocity and acceleration and 5 indicates a
+                   quintic spline with continuous velocity, acceleration,
+                   jerk and snap, and zero acceleration at both ends
+    :return: A trajectory as an N x n matrix, where each row is an n-vector
+             of joint variables at an instant in time. The first row is the
+             first waypoint and the Nth row is the last. The elapsed time
+             between each row is (tlist[m - 1] - tlist[0]) / (N - 1)
+    The velocities (and for method 5 accelerations) at the intermediate
+    waypoints follow from the continuity conditions, a block tridiagonal
+    system solved in time linear in m. All N points are then evaluated
+    together from the Hermite form of each segment.
+
+    Example Input:
+        thetamat = np.array([[0, 0],
+                             [1, 2],
+                             [2, 0]])
+        tlist = np.array([0, 1, 2])
+        N = 5
+        method = 3
+    Output:
+        np.array([[     0, 0],
+                  [0.3125, 1],
+                  [     1, 2],
+                  [1.6875, 1],
+                  [     2, 0]])
+    """
+    thetamat = np.array(thetamat, dtype=float)
+    tlist = np.array(tlist, dtype=float)
+    m, n = thetamat.shape
+    h = np.diff(tlist)[:, None]
+    delta = np.diff(thetamat, axis=0)
+    dthetamat = np.zeros((m, n))
+    ddthetamat = np.zeros((m, n))
+    if m > 2:
+        hL, hR = h[: -1, 0], h[1:, 0]
+        dL, dR = delta[: -1], delta[1:]
+        L = np.zeros((m - 2, 2, 2))
+        D = np.zeros((m - 2, 2, 2))
+        U = np.zeros((m - 2, 2, 2))
+        b = np.zeros((m - 2, 2, n))
         if method == 3:
-            s = CubicTimeScaling(Tf, timegap * i)
+            # Continuous acceleration: the classic tridiagonal system for
+            # the velocities, padded with a trivial second unknown
+            L[:, 0, 0] = hR
+            D[:, 0, 0] = 2 * (hL + hR)
+            D[:, 1, 1] = 1
+            U[:, 0, 0] = hL
+            b[:, 0] = 3 * (hR[:, None] * dL / hL[:, None] \
+                           + hL[:, None] * dR / hR[:, None])
         else:
-            s = QuinticTimeScaling(Tf, timegap * i)
-        traj[:, i] = s * np.array(thetaend) + (1 - s) * np.array(thetastart)
-    traj = np.array(traj).T
+            # Continuous jerk and snap of the quintic segments on each side
+            # of a waypoint, in the unknowns (velocity, acceleration)
+            L[:, 0] = np.c_[-24 / hL ** 2, -3 / hL]
+            D[:, 0] = np.c_[36 / hR ** 2 - 36 / hL ** 2, 9 / hL + 9 / hR]
+            U[:, 0] = np.c_[24 / hR ** 2, -3 / hR]
+            b[:, 0] = 60 * (dR / hR[:, None] ** 3 - dL / hL[:, None] ** 3)
+            L[:, 1] = np.c_[-168 / hL ** 3, -24 / hL ** 2]
+            D[:, 1] = np.c_[-192 / hL ** 3 - 192 / hR ** 3, \
+                            36 / hL ** 2 - 36 / hR ** 2]
+            U[:, 1] = np.c_[-168 / hR ** 3, 24 / hR ** 2]
+            b[:, 1] = -360 * (dL / hL[:, None] ** 4 + dR / hR[:, None] ** 4)
+        x = _BlockTridiagonalSolve(L, D, U, b)
+        dthetamat[1: -1] = x[:, 0]
+        if method != 3:
+            ddthetamat[1: -1] = x[:, 1]
+
+    # Locate every sample in its segment and evaluate the Hermite form
+    t = np.linspace(tlist[0], tlist[-1], int(N))
+    k = np.clip(np.searchsorted(tlist, t, side='right') - 1, 0, m - 2)
+    hk = h[k]
+    u = (t - tlist[k])[:, None] / hk
+    p0, p1 = thetamat[k], thetamat[k + 1]
+    v0, v1 = dthetamat[k] * hk, dthetamat[k + 1] * hk
+    if method == 3:
+        return (2 * u ** 3 - 3 * u ** 2 + 1) * p0 \
+               + (u ** 3 - 2 * u ** 2 + u) * v0 \
+               + (-2 * u ** 3 + 3 * u ** 2) * p1 \
+               + (u ** 3 - u ** 2) * v1
+    a0, a1 = ddthetamat[k] * hk ** 2, ddthetamat[k + 1] * hk ** 2
+    return (1 - 10 * u ** 3 + 15 * u ** 4 - 6 * u ** 5) * p0 \
+           + (u - 6 * u ** 3 + 8 * u ** 4 - 3 * u ** 5) * v0 \
+           + (0.5 * u ** 2 - 1.5 * u ** 3 + 1.5 * u ** 4 - 0.5 * u ** 5) * a0 \
+           + (10 * u ** 3 - 15 * u ** 4 + 6 * u ** 5) * p1 \
+           + (-4 * u ** 3 + 7 * u ** 4 - 3 * u ** 5) * v1 \
+           + (0.5 * u ** 3 - u ** 4 + 0.5 * u ** 5) * a1
+
+def _ViaPointBlend(tlist, tblend, N):
+    """Computes, for N equally spaced times, the waypoint i whose blend or
+    adjacent straight segment contains each time and the durations alpha and
+    beta to spend at the velocities of the segments entering and leaving
+    waypoint i
+
+    :return: (i, alpha, beta, spans), where spans are the times between the
+             blend centers of consecutive waypoints
+    The blend at waypoint i ramps the velocity linearly over tblend[i]
+    seconds, centered at tlist[i] for the intermediate waypoints and inside
+    the motion for the first and last ones, so that the straight segments
+    still pass through every waypoint.
+    """
+    tlist = np.array(tlist, dtype=float)
+    m = len(tlist)
+    tb = np.array(np.broadcast_to(tblend, (m,)), dtype=float)
+    if np.any(tb <= 0):
+        raise ValueError("tblend must be positive; a zero blend would " \
+                         "change the velocity instantaneously")
+    c = tlist.copy()
+    c[0] = c[0] + tb[0] / 2
+    c[-1] = c[-1] - tb[-1] / 2
+    if np.any(c[: -1] + tb[: -1] / 2 > c[1:] - tb[1:] / 2 + 1e-12):
+        raise ValueError("Blends at consecutive waypoints overlap; shorten " \
+                         "tblend or lengthen the segments")
+    t = np.linspace(tlist[0], tlist[-1], int(N))
+    k = np.clip(np.searchsorted(c, t, side='right') - 1, 0, m - 2)
+    i = np.where(c[k + 1] - t < tb[k + 1] / 2, k + 1, k)
+    tau = t - c[i]
+    h = tb[i]
+    beta = np.where(tau <= -h / 2, 0, np.where(tau >= h / 2, tau, \
+                    (tau + h / 2) ** 2 / (2 * h)))
+    return i, tau - beta, beta, np.diff(c)
+
+def JointTrajectoryBlend(thetamat, tlist, tblend, N):
+    """Computes a trajectory in joint space along straight segments between
+    waypoints, joined by parabolic blends instead of stopping at each one
+
+    :param thetamat: An m x n matrix whose rows are the m >= 2 joint
+                     waypoints, in order
+    :param tlist: The m increasing times in seconds of the waypoints
+    :param tblend: The duration in seconds of the blend at each waypoint, a
+                   scalar or an m-vector. The motion starts and ends at rest,
+                   speeding up and slowing down over the first and last blend
+    :param N: The number of points N > 1 (Start and stop) in the discrete
+              representation of the trajectory
+    :return: A trajectory as an N x n matrix, where each row is an n-vector
+             of joint variables at an instant in time. The first row is the
+             first waypoint and the Nth row is the last. The elapsed time
+             between each row is (tlist[m - 1] - tlist[0]) / (N - 1)
+    Each joint moves at constant velocity along the segments and at constant
+    acceleration during the blends. The straight segments pass through the
+    intermediate waypoints at tlist, while the blend cuts the corner, missing
+    waypoint i by (change in velocity) * tblend[i] / 8. Raises ValueError if
+    a blend duration is not positive or the blends of consecutive waypoints
+    overlap.
+
+    Example Input:
+        thetamat = np.array([[0, 0],
+                             [1, 1],
+                             [2, 0]])
+        tlist = np.array([0, 1, 2])
+        tblend = 0.4
+        N = 5
+    Output:
+        np.array([[    0,     0],
+                  [0.375, 0.375],
+                  [    1, 0.875],
+                  [1.625, 0.375],
+                  [    2,     0]])
+    """
+    thetamat = np.array(thetamat, dtype=float)
+    i, alpha, beta, spans = _ViaPointBlend(tlist, tblend, N)
+    n = thetamat.shape[1]
+    v = np.r_[np.zeros((1, n)), np.diff(thetamat, axis=0) / spans[:, None], \
+              np.zeros((1, n))]
+    return thetamat[i] + v[i] * alpha[:, None] + v[i + 1] * beta[:, None]
+
+def CartesianTrajectoryBlend(Xlist, tlist, tblend, N):
+    """Computes a trajectory of the end-effector frame along straight
+    segments between waypoints, joined by parabolic blends instead of
+    stopping at each one
+
+    :param Xlist: The m >= 2 end-effector waypoint configurations in SE(3),
+                  as a list or an m x 4 x 4 array, in order
+    :param tlist: The m increasing times in seconds of the waypoints
+    :param tblend: The duration in seconds of the blend at each waypoint, a
+                   scalar or an m-vector. The motion starts and ends at rest,
+                   speeding up and slowing down over the first and last blend
+    :param N: The number of points N > 1 (Start and stop) in the discrete
+              representation of the trajectory
+    :return: The discretized trajectory as an N x 4 x 4 array of matrices in
+             SE(3) separated in time by (tlist[m - 1] - tlist[0]) / (N - 1).
+             The first is the first waypoint and the Nth is the last
+    As in CartesianTrajectory, the origin of the end-effector frame follows
+    straight lines decoupled from the rotation, which turns about a fixed
+    axis along each segment. During a blend the linear and angular
+    velocities change at a constant rate from those of the incoming segment
+    to those of the outgoing one. Raises ValueError if a blend duration is
+    not positive or the blends of consecutive waypoints overlap.
+
+    Example Input:
+        Xlist = [np.eye(4),
+                 np.array([[1, 0, 0, 1],
+                           [0, 1, 0, 0],
+                           [0, 0, 1, 0],
+                           [0, 0, 0, 1]]),
+                 np.array([[1, 0, 0, 1],
+                           [0, 1, 0, 1],
+                           [0, 0, 1, 0],
+                           [0, 0, 0, 1]])]
+        tlist = np.array([0, 1, 2])
+        tblend = 0.4
+        N = 5
+    Output:
+        np.array([[[1, 0, 0,      0],
+                   [0, 1, 0,      0],
+                   [0, 0, 1,      0],
+                   [0, 0, 0,      1]],
+                  [[1, 0, 0,  0.375],
+                   [0, 1, 0,      0],
+                   [0, 0, 1,      0],
+                   [0, 0, 0,      1]],
+                  [[1, 0, 0, 0.9375],
+                   [0, 1, 0, 0.0625],
+                   [0, 0, 1,      0],
+                   [0, 0, 0,      1]],
+                  [[1, 0, 0,      1],
+                   [0, 1, 0,  0.625],
+                   [0, 0, 1,      0],
+                   [0, 0, 0,      1]],
+                  [[1, 0, 0,      1],
+                   [0, 1, 0,      1],
+                   [0, 0, 1,      0],
+                   [0, 0, 0,      1]]])
+    """
+    Xlist = np.array(Xlist, dtype=float)
+    i, alpha, beta, spans = _ViaPointBlend(tlist, tblend, N)
+    Rlist = Xlist[:, 0: 3, 0: 3]
+    plist = Xlist[:, 0: 3, 3]
+    omgs = np.array([so3ToVec(MatrixLog3(np.dot(Rlist[k].T, Rlist[k + 1]))) \
+                     for k in range(len(Xlist) - 1)]) / spans[:, None]
+    omgs = np.r_[np.zeros((1, 3)), omgs, np.zeros((1, 3))]
+    v = np.r_[np.zeros((1, 3)), np.diff(plist, axis=0) / spans[:, None], \
+              np.zeros((1, 3))]
+    traj = np.zeros((len(i), 4, 4))
+    traj[:, 0: 3, 0: 3] \
+    = np.matmul(np.matmul(Rlist[i], \
+                          MatrixExp3Batch(omgs[i] * alpha[:, None])), \
+                MatrixExp3Batch(omgs[i + 1] * beta[:, None]))
+    traj[:, 0: 3, 3] = plist[i] + v[i] * alpha[:, None] \
+                       + v[i + 1] * beta[:, None]
+    traj[:, 3, 3] = 1
     return traj
 
-def ScrewTrajectory(Xstart, Xend, Tf, N, method):
+def ScrewTrajectory(Xstart, Xend, Tf, N, method, limits=None):
     """Computes a trajectory as a list of N SE(3) matrices corresponding to
       the screw motion about a space screw axis
 
     :param Xstart: The initial end-effector configuration
     :param Xend: The final end-effector configuration
-    :param Tf: Total time of the motion in seconds from rest to rest
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits of a 'trapezoidal'
+               or 'scurve' method
     :param N: The number of points N > 1 (Start and stop) in the discrete
               representation of the trajectory
     :param method: The time-scaling method, where 3 indicates cubic (third-
-                   order polynomial) time scaling and 5 indicates quintic
-                   (fifth-order polynomial) time scaling
+                   order polynomial) time scaling, 5 indicates quintic
+                   (fifth-order polynomial) time scaling, 'trapezoidal' a
+                   trapezoidal velocity profile and 'scurve' a jerk-limited
+                   velocity profile, the last two computed from limits
+    :param limits: The limits (vmax, amax) for 'trapezoidal' or (vmax, amax,
+                   jmax) for 'scurve' on the angular and linear parts of the
+                   twist, each a scalar or a 2-vector (angular, linear)
     :return: The discretized trajectory as a list of N matrices in SE(3)
              separated in time by Tf/(N-1). The first in the list is Xstart
              and the Nth is Xend
@@ -1575,30 +3906,97 @@ def ScrewTrajectory(Xstart, Xend, Tf, N, method):
                    [0, 0, 0,   1]])]
     """
     N = int(N)
-    timegap = Tf / (N - 1.0)
+    slist = _PathTimeScaling(Tf, N, method, \
+                             _SE3PathLengths(Xstart, Xend, True), limits)[0]
     traj = [[None]] * N
     for i in range(N):
-        if method == 3:
-            s = CubicTimeScaling(Tf, timegap * i)
-        else:
-            s = QuinticTimeScaling(Tf, timegap * i)
         traj[i] \
         = np.dot(Xstart, MatrixExp6(MatrixLog6(np.dot(TransInv(Xstart), \
-                                                      Xend)) * s))
+                                                      Xend)) * slist[i]))
     return traj
 
-def CartesianTrajectory(Xstart, Xend, Tf, N, method):
+def ScrewTrajectoryArray(Xstart, Xend, Tf, N, method, limits=None):
+    """Computes a trajectory as an array of N SE(3) matrices corresponding to
+    the screw motion about a space screw axis
+
+    :param Xstart: The initial end-effector configuration
+    :param Xend: The final end-effector configuration
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits of a 'trapezoidal'
+               or 'scurve' method
+    :param N: The number of points N > 1 (Start and stop) in the discrete
+              representation of the trajectory
+    :param method: The time-scaling method, where 3 indicates cubic (third-
+                   order polynomial) time scaling, 5 indicates quintic
+                   (fifth-order polynomial) time scaling, 'trapezoidal' a
+                   trapezoidal velocity profile and 'scurve' a jerk-limited
+                   velocity profile, the last two computed from limits
+    :param limits: The limits (vmax, amax) for 'trapezoidal' or (vmax, amax,
+                   jmax) for 'scurve' on the angular and linear parts of the
+                   twist, each a scalar or a 2-vector (angular, linear)
+    :return: The discretized trajectory as an N x 4 x 4 array of matrices in
+             SE(3) separated in time by Tf/(N-1). The first is Xstart and the
+             Nth is Xend
+    Returns the same matrices as ScrewTrajectory. The screw motion from
+    Xstart to Xend is computed once and the time scaling and exponentials
+    are evaluated for all N points together.
+
+    Example Input:
+        Xstart = np.array([[1, 0, 0, 1],
+                           [0, 1, 0, 0],
+                           [0, 0, 1, 1],
+                           [0, 0, 0, 1]])
+        Xend = np.array([[0, 0, 1, 0.1],
+                         [1, 0, 0,   0],
+                         [0, 1, 0, 4.1],
+                         [0, 0, 0,   1]])
+        Tf = 5
+        N = 4
+        method = 3
+    Output:
+        np.array([[[1, 0, 0, 1],
+                   [0, 1, 0, 0],
+                   [0, 0, 1, 1],
+                   [0, 0, 0, 1]],
+                  [[0.904, -0.25, 0.346, 0.441],
+                   [0.346, 0.904, -0.25, 0.529],
+                   [-0.25, 0.346, 0.904, 1.601],
+                   [    0,     0,     0,     1]],
+                  [[0.346, -0.25, 0.904, -0.117],
+                   [0.904, 0.346, -0.25,  0.473],
+                   [-0.25, 0.904, 0.346,  3.274],
+                   [    0,     0,     0,      1]],
+                  [[0, 0, 1, 0.1],
+                   [1, 0, 0,   0],
+                   [0, 1, 0, 4.1],
+                   [0, 0, 0,   1]]])
+    """
+    N = int(N)
+    s = _PathTimeScaling(Tf, N, method, \
+                         _SE3PathLengths(Xstart, Xend, True), limits)[0]
+    expc6 = se3ToVec(MatrixLog6(np.dot(TransInv(Xstart), Xend)))
+    return np.matmul(Xstart, MatrixExp6Batch(s[:, None] * expc6))
+
+def CartesianTrajectory(Xstart, Xend, Tf, N, method, limits=None):
     """Computes a trajectory as a list of N SE(3) matrices corresponding to
     the origin of the end-effector frame following a straight line
 
     :param Xstart: The initial end-effector configuration
     :param Xend: The final end-effector configuration
-    :param Tf: Total time of the motion in seconds from rest to rest
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits of a 'trapezoidal'
+               or 'scurve' method
     :param N: The number of points N > 1 (Start and stop) in the discrete
               representation of the trajectory
     :param method: The time-scaling method, where 3 indicates cubic (third-
-                   order polynomial) time scaling and 5 indicates quintic
-                   (fifth-order polynomial) time scaling
+                   order polynomial) time scaling, 5 indicates quintic
+                   (fifth-order polynomial) time scaling, 'trapezoidal' a
+                   trapezoidal velocity profile and 'scurve' a jerk-limited
+                   velocity profile, the last two computed from limits
+    :param limits: The limits (vmax, amax) for 'trapezoidal' or (vmax, amax,
+                   jmax) for 'scurve' on the rotation and on the translation
+                   of the end-effector origin, each a scalar or a 2-vector
+                   (angular, linear)
     :return: The discretized trajectory as a list of N matrices in SE(3)
              separated in time by Tf/(N-1). The first in the list is Xstart
              and the Nth is Xend
@@ -1637,15 +4035,13 @@ def CartesianTrajectory(Xstart, Xend, Tf, N, method):
                    [0, 0, 0,   1]])]
     """
     N = int(N)
-    timegap = Tf / (N - 1.0)
+    slist = _PathTimeScaling(Tf, N, method, \
+                             _SE3PathLengths(Xstart, Xend, False), limits)[0]
     traj = [[None]] * N
     Rstart, pstart = TransToRp(Xstart)
     Rend, pend = TransToRp(Xend)
     for i in range(N):
-        if method == 3:
-            s = CubicTimeScaling(Tf, timegap * i)
-        else:
-            s = QuinticTimeScaling(Tf, timegap * i)
+        s = slist[i]
         traj[i] \
         = np.r_[np.c_[np.dot(Rstart, \
         MatrixExp3(MatrixLog3(np.dot(np.array(Rstart).T,Rend)) * s)), \
@@ -1653,6 +4049,385 @@ def CartesianTrajectory(Xstart, Xend, Tf, N, method):
                    [[0, 0, 0, 1]]]
     return traj
 
+def CartesianTrajectoryArray(Xstart, Xend, Tf, N, method, limits=None):
+    """Computes a trajectory as an array of N SE(3) matrices corresponding to
+    the origin of the end-effector frame following a straight line
+
+    :param Xstart: The initial end-effector configuration
+    :param Xend: The final end-effector configuration
+    :param Tf: Total time of the motion in seconds from rest to rest, or None
+               for the minimum time allowed by the limits of a 'trapezoidal'
+               or 'scurve' method
+    :param N: The number of points N > 1 (Start and stop) in the discrete
+              representation of the trajectory
+    :param method: The time-scaling method, where 3 indicates cubic (third-
+                   order polynomial) time scaling, 5 indicates quintic
+                   (fifth-order polynomial) time scaling, 'trapezoidal' a
+                   trapezoidal velocity profile and 'scurve' a jerk-limited
+                   velocity profile, the last two computed from limits
+    :param limits: The limits (vmax, amax) for 'trapezoidal' or (vmax, amax,
+                   jmax) for 'scurve' on the rotation and on the translation
+                   of the end-effector origin, each a scalar or a 2-vector
+                   (angular, linear)
+    :return: The discretized trajectory as an N x 4 x 4 array of matrices in
+             SE(3) separated in time by Tf/(N-1). The first is Xstart and the
+             Nth is Xend
+    Returns the same matrices as CartesianTrajectory. The rotation from
+    Rstart to Rend is computed once and the time scaling, exponentials and
+    positions are evaluated for all N points together.
+
+    Example Input:
+        Xstart = np.array([[1, 0, 0, 1],
+                           [0, 1, 0, 0],
+                           [0, 0, 1, 1],
+                           [0, 0, 0, 1]])
+        Xend = np.array([[0, 0, 1, 0.1],
+                         [1, 0, 0,   0],
+                         [0, 1, 0, 4.1],
+                         [0, 0, 0,   1]])
+        Tf = 5
+        N = 4
+        method = 5
+    Output:
+        np.array([[[1, 0, 0, 1],
+                   [0, 1, 0, 0],
+                   [0, 0, 1, 1],
+                   [0, 0, 0, 1]],
+                  [[ 0.937, -0.214,  0.277, 0.811],
+                   [ 0.277,  0.937, -0.214,     0],
+                   [-0.214,  0.277,  0.937, 1.651],
+                   [     0,      0,      0,     1]],
+                  [[ 0.277, -0.214,  0.937, 0.289],
+                   [ 0.937,  0.277, -0.214,     0],
+                   [-0.214,  0.937,  0.277, 3.449],
+                   [     0,      0,      0,     1]],
+                  [[0, 0, 1, 0.1],
+                   [1, 0, 0,   0],
+                   [0, 1, 0, 4.1],
+                   [0, 0, 0,   1]]])
+    """
+    N = int(N)
+    s = _PathTimeScaling(Tf, N, method, \
+                         _SE3PathLengths(Xstart, Xend, False), limits)[0]
+    Rstart, pstart = TransToRp(Xstart)
+    Rend, pend = TransToRp(Xend)
+    omg = so3ToVec(MatrixLog3(np.dot(np.array(Rstart).T, Rend)))
+    traj = np.zeros((N, 4, 4))
+    traj[:, 0: 3, 0: 3] = np.matmul(Rstart, MatrixExp3Batch(s[:, None] * omg))
+    traj[:, 0: 3, 3] = s[:, None] * np.array(pend) \
+                       + (1 - s[:, None]) * np.array(pstart)
+    traj[:, 3, 3] = 1
+    return traj
+
+def _TimeScalingDerivatives(Tf, t, method):
+    """Computes s(t) and its first two time derivatives for the cubic
+    (method 3) or quintic (otherwise) time scaling
+    """
+    if method == 3:
+        return CubicTimeScalingDerivatives(Tf, t)
+    return QuinticTimeScalingDerivatives(Tf, t)
+
+def _QuinticCoefficients(theta0, dtheta0, ddtheta0, thetaf, Tf):
+    """Computes the coefficients c0..c5 (rows) of the quintic polynomial in
+    time that starts at (theta0, dtheta0, ddtheta0) and comes to rest at
+    thetaf after Tf seconds
+    """
+    d = np.asarray(thetaf, dtype=float) - theta0
+    return np.array([theta0, \
+                     dtheta0, \
+                     0.5 * ddtheta0, \
+                     (20 * d - 12 * dtheta0 * Tf - 3 * ddtheta0 * Tf ** 2) \
+                     / (2.0 * Tf ** 3), \
+                     (-30 * d + 16 * dtheta0 * Tf + 3 * ddtheta0 * Tf ** 2) \
+                     / (2.0 * Tf ** 4), \
+                     (12 * d - 6 * dtheta0 * Tf - ddtheta0 * Tf ** 2) \
+                     / (2.0 * Tf ** 5)])
+
+def _SegmentSteps(Tf, dt):
+    """Number of samples after the first needed to reach Tf in steps of dt,
+    the last one being shortened to end exactly at Tf
+    """
+    return max(int(np.ceil(1.0 * Tf / dt - 1e-9)), 1)
+
+def JointTrajectoryStream(thetastart, thetaend, Tf, dt, method=5):
+    """Yields a straight-line trajectory in joint space one setpoint at a
+    time, with support for re-targeting while in motion
+
+    :param thetastart: The initial joint variables
+    :param thetaend: The final joint variables
+    :param Tf: Total time of the motion in seconds from rest to rest
+    :param dt: The time between setpoints. The last setpoint of a motion is
+               at Tf even if Tf is not a multiple of dt
+    :param method: The time-scaling method, where 3 indicates cubic (third-
+                   order polynomial) time scaling and 5 indicates quintic
+                   (fifth-order polynomial) time scaling
+    :return: A generator of (t, thetalist, dthetalist, ddthetalist) tuples,
+             starting with t = 0 at thetastart and ending at rest at thetaend
+    Each setpoint is computed when it is requested, so memory use does not
+    depend on the length of the motion and iteration can stop at any time
+    (preemption). Sending a new target with the generator's send method,
+    either thetaend or a tuple (thetaend, Tf), re-targets the motion: from
+    the last yielded setpoint, a quintic that matches its position,
+    velocity and acceleration and comes to rest at the new target after Tf
+    seconds (the original Tf if not given) replaces the rest of the motion.
+    The value returned by send is the next setpoint of the new motion.
+    Without re-targeting, the setpoints equal JointTrajectory at the same
+    times.
+
+    Example Input:
+        stream = mr.JointTrajectoryStream(np.array([0, 0]),
+                                          np.array([1, 2]), 1, 0.25, 3)
+        next(stream)
+        next(stream)
+        stream.send(np.array([0, 0]))
+    Output:
+        (0.0, array([0., 0.]), array([0., 0.]), array([6., 12.]))
+        (0.25, array([0.15625, 0.3125]), array([1.125, 2.25]),
+         array([3., 6.]))
+        (0.5, array([0.38726807, 0.77453613]),
+         array([0.34936523, 0.69873047]), array([-6.15234375, -12.3046875]))
+    """
+    thetastart = np.asarray(thetastart, dtype=float)
+    d = np.asarray(thetaend, dtype=float) - thetastart
+    coeffs = np.zeros((6, len(thetastart)))
+    coeffs[0] = thetastart
+    if method == 3:
+        coeffs[2] = 3 * d / Tf ** 2
+        coeffs[3] = -2 * d / Tf ** 3
+    else:
+        coeffs[3] = 10 * d / Tf ** 3
+        coeffs[4] = -15 * d / Tf ** 4
+        coeffs[5] = 6 * d / Tf ** 5
+    Tseg = Tf
+    tseg = 0.0
+    steps = _SegmentSteps(Tseg, dt)
+    j = 0
+    while True:
+        tau = min(1.0 * j * dt, Tseg)
+        powers = tau ** np.arange(6)
+        thetalist = np.dot(powers, coeffs)
+        dthetalist = np.dot(np.arange(1, 6) * powers[: 5], coeffs[1:])
+        ddthetalist = np.dot(np.array([2, 6, 12, 20]) * powers[: 4], \
+                             coeffs[2:])
+        target = yield (tseg + tau, thetalist, dthetalist, ddthetalist)
+        if target is not None:
+            if isinstance(target, tuple) and len(target) == 2 \
+               and np.ndim(target[0]) == 1 and np.ndim(target[1]) == 0:
+                target, Tseg = target
+            else:
+                Tseg = Tf
+            coeffs = _QuinticCoefficients(thetalist, dthetalist, \
+                                          ddthetalist, target, Tseg)
+            tseg = tseg + tau
+            steps = _SegmentSteps(Tseg, dt)
+            j = 0
+        elif j >= steps:
+            return
+        j = j + 1
+
+def ScrewTrajectoryStream(Xstart, Xend, Tf, dt, method=5):
+    """Yields a screw motion trajectory in SE(3) one setpoint at a time
+
+    :param Xstart: The initial end-effector configuration
+    :param Xend: The final end-effector configuration
+    :param Tf: Total time of the motion in seconds from rest to rest
+    :param dt: The time between setpoints. The last setpoint is at Tf even if
+               Tf is not a multiple of dt
+    :param method: The time-scaling method, where 3 indicates cubic (third-
+                   order polynomial) time scaling and 5 indicates quintic
+                   (fifth-order polynomial) time scaling
+    :return: A generator of (t, X, V, dV) tuples, where X is the
+             configuration at time t and V and dV are its body twist and the
+             time derivative of the twist
+    The screw axis is computed once and each setpoint is computed when it is
+    requested; iteration can stop at any time (preemption). The
+    configurations equal ScrewTrajectory at the same times.
+
+    Example Input:
+        Xstart = np.eye(4)
+        Xend = np.array([[1, 0, 0, 1],
+                         [0, 1, 0, 0],
+                         [0, 0, 1, 0],
+                         [0, 0, 0, 1]])
+        stream = mr.ScrewTrajectoryStream(Xstart, Xend, 2, 1, 3)
+        list(stream)[1]
+    Output:
+        (1.0, array([[1. , 0. , 0. , 0.5],
+                     [0. , 1. , 0. , 0. ],
+                     [0. , 0. , 1. , 0. ],
+                     [0. , 0. , 0. , 1. ]]),
+         array([0.  , 0.  , 0.  , 0.75, 0.  , 0.  ]),
+         array([0., 0., 0., 0., 0., 0.]))
+    """
+    expc6 = se3ToVec(MatrixLog6(np.dot(TransInv(Xstart), Xend)))
+    steps = _SegmentSteps(Tf, dt)
+    for j in range(steps + 1):
+        t = min(1.0 * j * dt, Tf)
+        s, sdot, sddot = _TimeScalingDerivatives(Tf, t, method)
+        yield (t, np.dot(Xstart, MatrixExp6(VecTose3(expc6 * s))), \
+               expc6 * sdot, expc6 * sddot)
+
+def CartesianTrajectoryStream(Xstart, Xend, Tf, dt, method=5):
+    """Yields a trajectory in SE(3) whose origin follows a straight line,
+    one setpoint at a time
+
+    :param Xstart: The initial end-effector configuration
+    :param Xend: The final end-effector configuration
+    :param Tf: Total time of the motion in seconds from rest to rest
+    :param dt: The time between setpoints. The last setpoint is at Tf even if
+               Tf is not a multiple of dt
+    :param method: The time-scaling method, where 3 indicates cubic (third-
+                   order polynomial) time scaling and 5 indicates quintic
+                   (fifth-order polynomial) time scaling
+    :return: A generator of (t, X, V, dV) tuples, where X is the
+             configuration at time t, V stacks the angular velocity in the
+             end-effector frame and the linear velocity of the origin in
+             the fixed frame, and dV is the time derivative of V
+    The rotation axis is computed once and each setpoint is computed when it
+    is requested; iteration can stop at any time (preemption). The
+    configurations equal CartesianTrajectory at the same times.
+
+    Example Input:
+        Xstart = np.eye(4)
+        Xend = np.array([[1, 0, 0, 1],
+                         [0, 1, 0, 0],
+                         [0, 0, 1, 0],
+                         [0, 0, 0, 1]])
+        stream = mr.CartesianTrajectoryStream(Xstart, Xend, 2, 1, 3)
+        list(stream)[1]
+    Output:
+        (1.0, array([[1. , 0. , 0. , 0.5],
+                     [0. , 1. , 0. , 0. ],
+                     [0. , 0. , 1. , 0. ],
+                     [0. , 0. , 0. , 1. ]]),
+         array([0.  , 0.  , 0.  , 0.75, 0.  , 0.  ]),
+         array([0., 0., 0., 0., 0., 0.]))
+    """
+    Rstart, pstart = TransToRp(Xstart)
+    Rend, pend = TransToRp(Xend)
+    omg = so3ToVec(MatrixLog3(np.dot(np.array(Rstart).T, Rend)))
+    dp = np.array(pend) - np.array(pstart)
+    steps = _SegmentSteps(Tf, dt)
+    for j in range(steps + 1):
+        t = min(1.0 * j * dt, Tf)
+        s, sdot, sddot = _TimeScalingDerivatives(Tf, t, method)
+        X = np.r_[np.c_[np.dot(Rstart, MatrixExp3(VecToso3(omg * s))), \
+                        pstart + s * dp], \
+                  [[0, 0, 0, 1]]]
+        yield (t, X, np.r_[omg, dp] * sdot, np.r_[omg, dp] * sddot)
+
+def TimeOptimalTimeScaling(thetamat, dthetamax, ddthetamax, taumax=None, \
+                           g=None, Mlist=None, Glist=None, Slist=None):
+    """Computes the fastest timing of a joint-space path subject to joint
+    velocity, acceleration and, optionally, torque limits
+
+    :param thetamat: An N x n matrix whose rows sample the path densely and
+                     in order, e.g. the output of JointTrajectory. The path
+                     starts and ends at rest
+    :param dthetamax: Joint velocity limits (scalar or n-vector)
+    :param ddthetamax: Joint acceleration limits (scalar or n-vector)
+    :param taumax: Optional joint force/torque limits (scalar or n-vector).
+                   If given, g, Mlist, Glist and Slist are also required
+    :param g: Gravity vector g
+    :param Mlist: List of link frames i relative to i-1 at the home position
+    :param Glist: Spatial inertia matrices Gi of the links
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :return tlist: The N-vector of times at which the rows of thetamat are
+                   reached, starting at 0
+    :return sdotlist: The N-vector of path speeds, where the path parameter s
+                      runs from 0 to 1 in equal steps along the rows
+    The path derivatives dtheta/ds and d2theta/ds2 are estimated by finite
+    differences over the rows. Every limit is then linear in ds/dt squared
+    and d2s/dt2 (the torque limits through InverseDynamicsBatch), which
+    gives at each row a maximum path speed and, for each path speed, a range
+    of feasible path accelerations. A backward pass from rest at the end,
+    decelerating as hard as allowed, and a forward pass from rest at the
+    start, accelerating as hard as allowed, yield the fastest path speed
+    profile below the maximum path speed. Returns an infinite time if the
+    path cannot be followed within the limits (e.g. the torque limits cannot
+    hold the robot against gravity).
+
+    Example Input:
+        thetamat = mr.JointTrajectory(np.array([0, 0]), np.array([1, 2]), 1,
+                                      101, 3)
+        tlist, sdotlist = mr.TimeOptimalTimeScaling(thetamat, 1, 2)
+        tlist[-1]
+    Output:
+        2.54511749
+    """
+    thetamat = np.asarray(thetamat, dtype=float)
+    N, n = thetamat.shape
+    ds = 1.0 / (N - 1)
+    dtheta = np.gradient(thetamat, ds, axis=0)
+    ddtheta = np.gradient(dtheta, ds, axis=0)
+    # Each limit reads |A * sddot + B * sdot^2 + C| <= lim, row by row
+    A = [dtheta]
+    B = [ddtheta]
+    C = [np.zeros((N, n))]
+    lim = [np.broadcast_to(ddthetamax, (N, n))]
+    if taumax is not None:
+        zeros = np.zeros((N, n))
+        gravity = InverseDynamicsBatch(thetamat, zeros, zeros, g, 0, \
+                                       Mlist, Glist, Slist)
+        A.append(InverseDynamicsBatch(thetamat, zeros, dtheta, np.zeros(3), \
+                                      0, Mlist, Glist, Slist))
+        B.append(InverseDynamicsBatch(thetamat, dtheta, ddtheta, \
+                                      np.zeros(3), 0, Mlist, Glist, Slist))
+        C.append(gravity)
+        lim.append(np.broadcast_to(taumax, (N, n)))
+    A = np.concatenate(A, axis=1)
+    B = np.concatenate(B, axis=1)
+    C = np.concatenate(C, axis=1)
+    lim = np.concatenate(lim, axis=1)
+
+    # Maximum path speed: velocity limits, limits that do not depend on
+    # sddot, and nonempty ranges of sddot
+    xmax = np.full(N, np.inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vel = np.broadcast_to(dthetamax, (N, n)) / np.abs(dtheta)
+        xmax = np.minimum(xmax, np.min(vel ** 2, axis=1))
+        active = np.abs(A) > 1e-9
+        for k in range(A.shape[1]):
+            rhs = np.where(B[:, k] > 0, lim[:, k] - C[:, k], \
+                           -lim[:, k] - C[:, k])
+            bound = np.where(~active[:, k] & (B[:, k] != 0), \
+                             rhs / B[:, k], np.inf)
+            xmax = np.minimum(xmax, bound)
+        # sddot >= alpha_lo + beta_lo * x and sddot <= alpha_hi + beta_hi * x
+        sgn = np.sign(A)
+        Asafe = np.where(active, A, 1.0)
+        alpha_lo = np.where(active, (-sgn * lim - C) / Asafe, -np.inf)
+        alpha_hi = np.where(active, (sgn * lim - C) / Asafe, np.inf)
+        beta = np.where(active, -B / Asafe, 0.0)
+        coef = beta[:, :, None] - beta[:, None, :]
+        rhs = alpha_hi[:, None, :] - alpha_lo[:, :, None]
+        bound = np.where(coef > 0, rhs / coef, np.inf)
+        xmax = np.minimum(xmax, np.min(bound, axis=(1, 2)))
+    xmax = np.maximum(xmax, 0)
+
+    # Backward pass: the fastest speeds from which the end can be reached,
+    # i.e. from which the next speed can be kept within [0, x[i + 1]]
+    x = np.zeros(N)
+    for i in range(N - 2, -1, -1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = 1 + 2 * ds * beta[i]
+            bound_lo = np.where(active[i] & (c > 0), \
+                                (x[i + 1] - 2 * ds * alpha_lo[i]) / c, np.inf)
+            bound_hi = np.where(active[i] & (c < 0), \
+                                2 * ds * alpha_hi[i] / -c, np.inf)
+        x[i] = max(min(xmax[i], np.min(bound_lo), np.min(bound_hi)), 0)
+    # Forward pass: the fastest speeds reachable from the start
+    x[0] = 0
+    for i in range(N - 1):
+        upper = np.min(alpha_hi[i] + beta[i] * x[i])
+        x[i + 1] = max(min(x[i + 1], x[i] + 2 * ds * upper), 0)
+
+    sdotlist = np.sqrt(x)
+    with np.errstate(divide='ignore'):
+        dtlist = 2 * ds / (sdotlist[: -1] + sdotlist[1:])
+    return np.r_[0, np.cumsum(dtlist)], sdotlist
+
 '''
 *** CHAPTER 11: ROBOT CONTROL ***
 '''
@@ -1718,7 +4493,7 @@ def ComputedTorque(thetalist, dthetalist, eint, g, Mlist, Glist, Slist, \
         np.array([133.00525246, -29.94223324, -3.03276856])
     """
     e = np.subtract(thetalistd, thetalist)
-    return np.dot(MassMatrix(thetalist, Mlist, Glist, Slist), \
+    return np.dot(MassMatrixCRBA(thetalist, Mlist, Glist, Slist), \
                   Kp * e + Ki * (np.array(eint) + e) \
                   + Kd * np.subtract(dthetalistd, dthetalist)) \
            + InverseDynamics(thetalist, dthetalist, ddthetalistd, g, \
@@ -1726,7 +4501,8 @@ def ComputedTorque(thetalist, dthetalist, eint, g, Mlist, Glist, Slist, \
 
 def SimulateControl(thetalist, dthetalist, g, Ftipmat, Mlist, Glist, \
                     Slist, thetamatd, dthetamatd, ddthetamatd, gtilde, \
-                    Mtildelist, Gtildelist, Kp, Ki, Kd, dt, intRes):
+                    Mtildelist, Gtildelist, Kp, Ki, Kd, dt, intRes, \
+                    integrator='euler'):
     """Simulates the computed torque controller over a given desired
     trajectory
 
@@ -1758,12 +4534,17 @@ def SimulateControl(thetalist, dthetalist, g, Ftipmat, Mlist, Glist, \
     :param intRes: Integration resolution is the number of times integration
                    (Euler) takes places between each time step. Must be an
                    integer value greater than or equal to 1
+    :param integrator: The integration method: 'euler' (EulerStep, the
+                       default), 'semi-implicit' (SemiImplicitEulerStep),
+                       'rk4' (RK4Step) or 'rk45' (RK45Step, which picks its
+                       own substeps and uses intRes only for the first one)
     :return taumat: An Nxn matrix of the controllers commanded joint forces/
                     torques, where each row of n forces/torques corresponds
                     to a single time instant
     :return thetamat: An Nxn matrix of actual joint angles
     The end of this function plots all the actual and desired joint angles
-    using matplotlib and random libraries.
+    using matplotlib and random libraries (see PlotSimulateControl). Use
+    SimulateControlHeadless to run the simulation without plotting.
 
     Example Input:
         from __future__ import print_function
@@ -1847,37 +4628,233 @@ def SimulateControl(thetalist, dthetalist, g, Ftipmat, Mlist, Glist, \
                              ddthetamatd, gtilde, Mtildelist, Gtildelist, \
                              Kp, Ki, Kd, dt, intRes)
     """
-    Ftipmat = np.array(Ftipmat).T
-    thetamatd = np.array(thetamatd).T
-    dthetamatd = np.array(dthetamatd).T
-    ddthetamatd = np.array(ddthetamatd).T
-    m,n = np.array(thetamatd).shape
-    thetacurrent = np.array(thetalist).copy()
-    dthetacurrent = np.array(dthetalist).copy()
-    eint = np.zeros((m,1)).reshape(m,)
-    taumat = np.zeros(np.array(thetamatd).shape)
-    thetamat = np.zeros(np.array(thetamatd).shape)
-    for i in range(n):
+    taumat, thetamat \
+    = SimulateControlHeadless(thetalist, dthetalist, g, Ftipmat, Mlist, \
+                              Glist, Slist, thetamatd, dthetamatd, \
+                              ddthetamatd, gtilde, Mtildelist, Gtildelist, \
+                              Kp, Ki, Kd, dt, intRes, integrator)
+    PlotSimulateControl(thetamat, thetamatd, dt)
+    return (taumat, thetamat)
+
+def SimulateControlHeadless(thetalist, dthetalist, g, Ftipmat, Mlist, \
+                            Glist, Slist, thetamatd, dthetamatd, \
+                            ddthetamatd, gtilde, Mtildelist, Gtildelist, \
+                            Kp, Ki, Kd, dt, intRes, integrator='euler', \
+                            diagnostics=False):
+    """Simulates the computed torque controller over a given desired
+    trajectory without plotting
+
+    :param thetalist: n-vector of initial joint variables
+    :param dthetalist: n-vector of initial joint velocities
+    :param g: Actual gravity vector g
+    :param Ftipmat: An N x 6 matrix of spatial forces applied by the end-
+                    effector (If there are no tip forces the user should
+                    input a zero and a zero matrix will be used)
+    :param Mlist: Actual list of link frames i relative to i-1 at the home
+                  position
+    :param Glist: Actual spatial inertia matrices Gi of the links
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :param thetamatd: An Nxn matrix of desired joint variables from the
+                      reference trajectory
+    :param dthetamatd: An Nxn matrix of desired joint velocities
+    :param ddthetamatd: An Nxn matrix of desired joint accelerations
+    :param gtilde: The gravity vector based on the model of the actual robot
+    :param Mtildelist: The link frame locations based on the model of the
+                       actual robot
+    :param Gtildelist: The link spatial inertias based on the model of the
+                       actual robot
+    :param Kp: The feedback proportional gain (identical for each joint)
+    :param Ki: The feedback integral gain (identical for each joint)
+    :param Kd: The feedback derivative gain (identical for each joint)
+    :param dt: The timestep between points on the reference trajectory
+    :param intRes: Integration resolution is the number of times integration
+                   takes places between each time step. Must be an integer
+                   value greater than or equal to 1
+    :param integrator: The integration method, as in SimulateControl
+    :param diagnostics: If True, a dictionary of per-step diagnostics is
+                        returned as a third value
+    :return taumat: An Nxn matrix of the controllers commanded joint forces/
+                    torques, where each row of n forces/torques corresponds
+                    to a single time instant
+    :return thetamat: An Nxn matrix of actual joint angles
+    :return diag: Only if diagnostics is True. A dictionary of Nxn matrices:
+                  'error', the joint error seen by the controller at each
+                  step, 'eint', the integral of the error used at each step,
+                  and 'dthetamat', the actual joint velocities
+    Runs the same simulation as SimulateControl and returns its results, but
+    does not import matplotlib or plot. Use PlotSimulateControl to plot the
+    results.
+
+    Example Input:
+        With the inputs of the SimulateControl example:
+        taumat, thetamat, diag \
+        = mr.SimulateControlHeadless(thetalist, dthetalist, g, Ftipmat, \
+                                     Mlist, Glist, Slist, thetamatd, \
+                                     dthetamatd, ddthetamatd, gtilde, \
+                                     Mtildelist, Gtildelist, Kp, Ki, Kd, \
+                                     dt, intRes, diagnostics=True)
+    """
+    thetamatd = np.asarray(thetamatd, dtype=float)
+    dthetamatd = np.asarray(dthetamatd, dtype=float)
+    ddthetamatd = np.asarray(ddthetamatd, dtype=float)
+    N, n = thetamatd.shape
+    Ftipmat = np.broadcast_to(Ftipmat, (N, 6))
+    thetacurrent = np.array(thetalist, dtype=float)
+    dthetacurrent = np.array(dthetalist, dtype=float)
+    eint = np.zeros(n)
+    taumat = np.zeros((N, n))
+    thetamat = np.zeros((N, n))
+    if diagnostics:
+        errmat = np.zeros((N, n))
+        eintmat = np.zeros((N, n))
+        dthetamat = np.zeros((N, n))
+    h = None
+    for i in range(N):
         taulist \
         = ComputedTorque(thetacurrent, dthetacurrent, eint, gtilde, \
-                         Mtildelist, Gtildelist, Slist, thetamatd[:, i], \
-                         dthetamatd[:, i], ddthetamatd[:, i], Kp, Ki, Kd)
-        for j in range(intRes):
-            ddthetalist \
-            = ForwardDynamics(thetacurrent, dthetacurrent, taulist, g, \
-                              Ftipmat[:, i], Mlist, Glist, Slist)
-            thetacurrent, dthetacurrent \
-            = EulerStep(thetacurrent, dthetacurrent, ddthetalist, \
-                        1.0 * dt / intRes)
+                         Mtildelist, Gtildelist, Slist, thetamatd[i], \
+                         dthetamatd[i], ddthetamatd[i], Kp, Ki, Kd)
+        if diagnostics:
+            errmat[i] = thetamatd[i] - thetacurrent
+            eintmat[i] = eint
+        accel = lambda theta, dtheta: \
+                ForwardDynamicsABA(theta, dtheta, taulist, g, Ftipmat[i], \
+                                   Mlist, Glist, Slist)
+        thetacurrent, dthetacurrent, h \
+        = _IntegrateInterval(thetacurrent, dthetacurrent, accel, dt, \
+                             intRes, integrator, h)
+        taumat[i] = taulist
+        thetamat[i] = thetacurrent
+        if diagnostics:
+            dthetamat[i] = dthetacurrent
+        eint = eint + dt * (thetamatd[i] - thetacurrent)
+    if diagnostics:
+        return taumat, thetamat, {'error': errmat, 'eint': eintmat, \
+                                  'dthetamat': dthetamat}
+    return taumat, thetamat
+
+def SimulateControlBatch(thetalist, dthetalist, g, Ftipmat, Mlist, Glist, \
+                         Slist, thetamatd, dthetamatd, ddthetamatd, gtilde, \
+                         Mtildelist, Gtildelist, Kp, Ki, Kd, dt, intRes, \
+                         integrator='euler'):
+    """Simulates the computed torque controller on B copies of the robot in
+    lockstep
+
+    :param thetalist: n-vector of initial joint variables, or a B x n matrix
+    :param dthetalist: n-vector of initial joint velocities, or a B x n
+                       matrix
+    :param g: Actual gravity vector g
+    :param Ftipmat: An N x 6 matrix of spatial forces applied by the end-
+                    effector (If there are no tip forces the user should
+                    input a zero and a zero matrix will be used)
+    :param Mlist: Actual list of link frames i relative to i-1 at the home
+                  position
+    :param Glist: Actual spatial inertia matrices Gi of the links
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :param thetamatd: An Nxn matrix of desired joint variables from the
+                      reference trajectory
+    :param dthetamatd: An Nxn matrix of desired joint velocities
+    :param ddthetamatd: An Nxn matrix of desired joint accelerations
+    :param gtilde: The model gravity vector, or a B x 3 matrix of them
+    :param Mtildelist: The model link frames, with shape (n+1, 4, 4), or
+                       (B, n+1, 4, 4) for a different model per copy
+    :param Gtildelist: The model link spatial inertias, with shape (n, 6, 6),
+                       or (B, n, 6, 6) for a different model per copy
+    :param Kp: The feedback proportional gain, or a B-vector of gains
+    :param Ki: The feedback integral gain, or a B-vector of gains
+    :param Kd: The feedback derivative gain, or a B-vector of gains
+    :param dt: The timestep between points on the reference trajectory
+    :param intRes: Integration resolution is the number of times integration
+                   takes places between each time step. Must be an integer
+                   value greater than or equal to 1
+    :param integrator: The integration method, as in SimulateControl
+    :return taumat: A B x N x n array of commanded joint forces/torques
+    :return thetamat: A B x N x n array of actual joint angles
+    :return metrics: A dictionary of B-vectors summarizing the tracking error
+                     thetamatd - thetamat of each copy: 'rms_error',
+                     'max_error' (largest absolute joint error) and
+                     'final_error' (norm of the error at the last step)
+    The number of copies B is taken from whichever of the initial state,
+    gains and model arguments are batched; the others are shared. Copy b
+    follows the same steps as SimulateControlHeadless with the b-th
+    arguments, but the controller and the dynamics of all copies are
+    evaluated together with InverseDynamicsBatch and ForwardDynamicsBatch.
+
+    Example Input:
+        With the inputs of the SimulateControl example, sweep Kp:
+        taumat, thetamat, metrics \
+        = mr.SimulateControlBatch(thetalist, dthetalist, g, Ftipmat, Mlist, \
+                                  Glist, Slist, thetamatd, dthetamatd, \
+                                  ddthetamatd, gtilde, Mtildelist, \
+                                  Gtildelist, np.array([10, 20, 40]), Ki, \
+                                  Kd, dt, intRes)
+        best = np.argmin(metrics['rms_error'])
+    """
+    thetamatd = np.asarray(thetamatd, dtype=float)
+    dthetamatd = np.asarray(dthetamatd, dtype=float)
+    ddthetamatd = np.asarray(ddthetamatd, dtype=float)
+    Mtildelist = np.asarray(Mtildelist, dtype=float)
+    Gtildelist = np.asarray(Gtildelist, dtype=float)
+    N, n = thetamatd.shape
+    B = max(np.size(Kp), np.size(Ki), np.size(Kd), \
+            np.shape(thetalist)[0] if np.ndim(thetalist) == 2 else 1, \
+            np.shape(dthetalist)[0] if np.ndim(dthetalist) == 2 else 1, \
+            np.shape(gtilde)[0] if np.ndim(gtilde) == 2 else 1, \
+            Mtildelist.shape[0] if Mtildelist.ndim == 4 else 1, \
+            Gtildelist.shape[0] if Gtildelist.ndim == 4 else 1)
+    Kp = np.broadcast_to(np.reshape(Kp, (-1, 1)), (B, 1))
+    Ki = np.broadcast_to(np.reshape(Ki, (-1, 1)), (B, 1))
+    Kd = np.broadcast_to(np.reshape(Kd, (-1, 1)), (B, 1))
+    gtilde = np.broadcast_to(gtilde, (B, 3))
+    Ftipmat = np.broadcast_to(Ftipmat, (N, 6))
+    thetacurrent = np.array(np.broadcast_to(thetalist, (B, n)), dtype=float)
+    dthetacurrent = np.array(np.broadcast_to(dthetalist, (B, n)), \
+                             dtype=float)
+    eint = np.zeros((B, n))
+    taumat = np.zeros((B, N, n))
+    thetamat = np.zeros((B, N, n))
+    h = None
+    for i in range(N):
+        e = thetamatd[i] - thetacurrent
+        # The model inverse dynamics are linear in the acceleration, so the
+        # feedback term Mtilde(theta) * u is folded into a single call
+        u = Kp * e + Ki * (eint + e) + Kd * (dthetamatd[i] - dthetacurrent)
+        taulist = InverseDynamicsBatch(thetacurrent, dthetacurrent, \
+                                       ddthetamatd[i] + u, gtilde, 0, \
+                                       Mtildelist, Gtildelist, Slist)
+        accel = lambda theta, dtheta: \
+                ForwardDynamicsBatch(theta, dtheta, taulist, g, Ftipmat[i], \
+                                     Mlist, Glist, Slist)
+        thetacurrent, dthetacurrent, h \
+        = _IntegrateInterval(thetacurrent, dthetacurrent, accel, dt, \
+                             intRes, integrator, h)
         taumat[:, i] = taulist
         thetamat[:, i] = thetacurrent
-        eint = np.add(eint, dt * np.subtract(thetamatd[:, i], thetacurrent))
-    # Output using matplotlib to plot
+        eint = eint + dt * (thetamatd[i] - thetacurrent)
+    err = thetamatd - thetamat
+    metrics = {'rms_error': np.sqrt(np.mean(err ** 2, axis=(1, 2))), \
+               'max_error': np.max(np.abs(err), axis=(1, 2)), \
+               'final_error': np.linalg.norm(err[:, -1], axis=1)}
+    return taumat, thetamat, metrics
+
+def PlotSimulateControl(thetamat, thetamatd, dt):
+    """Plots the actual and desired joint angles of a controller simulation
+
+    :param thetamat: An Nxn matrix of actual joint angles
+    :param thetamatd: An Nxn matrix of desired joint angles
+    :param dt: The timestep between rows
+    Imports matplotlib only when called, and prints a message instead of
+    plotting if it is not available.
+    """
     try:
         import matplotlib.pyplot as plt
     except:
         print('The result will not be plotted due to a lack of package matplotlib')
     else:
+        thetamat = np.array(thetamat).T
+        thetamatd = np.array(thetamatd).T
         links = np.array(thetamat).shape[0]
         N = np.array(thetamat).shape[1]
         Tf = N * dt
@@ -1894,6 +4871,212 @@ def SimulateControl(thetalist, dthetalist, g, Ftipmat, Mlist, Glist, \
         plt.ylabel("Joint Angles")
         plt.title("Plot of Actual and Desired Joint Angles")
         plt.show()
-    taumat = np.array(taumat).T
-    thetamat = np.array(thetamat).T
-    return (taumat, thetamat)
+
+'''
+*** ROBOT MODEL ***
+'''
+
+class RobotModel(object):
+    """Stores the description of an open chain robot together with the
+    quantities that do not depend on its configuration
+
+    :param M: The home configuration of the end-effector
+    :param Slist: Screw axes Si of the joints in a space frame, in the format
+                  of a matrix with axes as the columns
+    :param Mlist: List of link frames {i} relative to {i-1} at the home
+                  position (optional, required only for dynamics)
+    :param Glist: Spatial inertia matrices Gi of the links (optional,
+                  required only for dynamics, and given together with Mlist)
+    The free functions convert their list arguments and rebuild the home
+    frame quantities on every call. A RobotModel does this work once: the
+    body screw axes Blist, the screw axes Ai of the joints in their link
+    frames and the adjoints of the inverse home transforms [Ad_Mi^-1] are
+    computed in the constructor, and the scratch arrays used by the forward
+    kinematics, the Jacobian and the Newton-Euler recursion are allocated
+    once and reused between calls. The methods return new arrays with the
+    same values as FKinSpace, JacobianSpace, InverseDynamics, MassMatrix and
+    ForwardDynamics. Raises ValueError if only one of Mlist and Glist is
+    given, or if a dynamics method is called on a model built without them.
+
+    Example Input (3 Link Robot):
+        M01 = np.array([[1, 0, 0,        0],
+                        [0, 1, 0,        0],
+                        [0, 0, 1, 0.089159],
+                        [0, 0, 0,        1]])
+        M12 = np.array([[ 0, 0, 1,    0.28],
+                        [ 0, 1, 0, 0.13585],
+                        [-1, 0, 0,       0],
+                        [ 0, 0, 0,       1]])
+        M23 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0, -0.1197],
+                        [0, 0, 1,   0.395],
+                        [0, 0, 0,       1]])
+        M34 = np.array([[1, 0, 0,       0],
+                        [0, 1, 0,       0],
+                        [0, 0, 1, 0.14225],
+                        [0, 0, 0,       1]])
+        G1 = np.diag([0.010267, 0.010267, 0.00666, 3.7, 3.7, 3.7])
+        G2 = np.diag([0.22689, 0.22689, 0.0151074, 8.393, 8.393, 8.393])
+        G3 = np.diag([0.0494433, 0.0494433, 0.004095, 2.275, 2.275, 2.275])
+        Glist = np.array([G1, G2, G3])
+        Mlist = np.array([M01, M12, M23, M34])
+        M = np.dot(np.dot(np.dot(M01, M12), M23), M34)
+        Slist = np.array([[1, 0, 1,      0, 1,     0],
+                          [0, 1, 0, -0.089, 0,     0],
+                          [0, 1, 0, -0.089, 0, 0.425]]).T
+        robot = mr.RobotModel(M, Slist, Mlist, Glist)
+        robot.inverse_dynamics(np.array([0.1, 0.1, 0.1]),
+                               np.array([0.1, 0.2, 0.3]),
+                               np.array([2, 1.5, 1]),
+                               np.array([0, 0, -9.8]),
+                               np.array([1, 1, 1, 1, 1, 1]))
+    Output:
+        np.array([74.69616155, -33.06766016, -3.23057314])
+    """
+    def __init__(self, M, Slist, Mlist=None, Glist=None):
+        self.M = np.array(M, dtype=float)
+        self.Slist = np.array(Slist, dtype=float)
+        self.n = self.Slist.shape[1]
+        self.Blist = np.dot(Adjoint(TransInv(self.M)), self.Slist)
+        self._expc6s = np.zeros((self.n, 6))
+        self._Ts = np.zeros((self.n + 1, 4, 4))
+        self._Ts[0] = np.eye(4)
+        self.Mlist = None
+        self.Glist = None
+        if (Mlist is None) != (Glist is None):
+            raise ValueError("Mlist and Glist must be given together")
+        if Mlist is not None:
+            self.Mlist = np.array(Mlist, dtype=float)
+            self.Glist = np.array(Glist, dtype=float)
+            Mi = np.eye(4)
+            self.Alist = np.zeros((6, self.n))
+            for i in range(self.n):
+                Mi = np.dot(Mi, self.Mlist[i])
+                self.Alist[:, i] = np.dot(Adjoint(TransInv(Mi)),
+                                          self.Slist[:, i])
+            self.AdMinvlist = AdjointBatch(TransInvBatch(self.Mlist))
+            self._AdTi = np.zeros((self.n + 1, 6, 6))
+            self._AdTi[self.n] = self.AdMinvlist[self.n]
+            self._Vi = np.zeros((self.n + 1, 6))
+            self._Vdi = np.zeros((self.n + 1, 6))
+            self._adVi = np.zeros((self.n + 1, 6, 6))
+            # [adV] is linear in V, so it is evaluated as V times the stacked
+            # [ad] of the unit vectors instead of being assembled entry-wise
+            self._adbasis = np.array([ad(e) for e in np.eye(6)]).reshape(6, 36)
+
+    def fk(self, thetalist):
+        """Computes forward kinematics in the space frame
+
+        :param thetalist: A list of joint coordinates
+        :return: The end-effector frame at thetalist, as FKinSpace
+        """
+        np.multiply(self.Slist.T, np.reshape(thetalist, (-1, 1)),
+                    out=self._expc6s)
+        exps = MatrixExp6Batch(self._expc6s)
+        Ts = self._Ts
+        for i in range(self.n):
+            np.dot(Ts[i], exps[i], out=Ts[i + 1])
+        return np.dot(Ts[self.n], self.M)
+
+    def jacobian(self, thetalist):
+        """Computes the space Jacobian
+
+        :param thetalist: A list of joint coordinates
+        :return: The 6xn space Jacobian at thetalist, as JacobianSpace
+        """
+        np.multiply(self.Slist.T, np.reshape(thetalist, (-1, 1)),
+                    out=self._expc6s)
+        exps = MatrixExp6Batch(self._expc6s)
+        Ts = self._Ts
+        for i in range(1, self.n):
+            np.dot(Ts[i - 1], exps[i - 1], out=Ts[i])
+        return np.einsum('ijk,ki->ji', AdjointBatch(Ts[: self.n]),
+                         self.Slist)
+
+    def _link_adjoints(self, thetalist):
+        """Fills the buffer of [Ad_T(i,i-1)] for the configuration thetalist
+
+        The last entry, [Ad_T(n+1,n)], is configuration independent and is
+        set in the constructor.
+        """
+        if self.Mlist is None:
+            raise ValueError("RobotModel was built without Mlist and Glist; " \
+                             "dynamics are not available")
+        np.multiply(self.Alist.T, -np.reshape(thetalist, (-1, 1)),
+                    out=self._expc6s)
+        exps = MatrixExp6Batch(self._expc6s)
+        np.matmul(AdjointBatch(exps), self.AdMinvlist[: self.n],
+                  out=self._AdTi[: self.n])
+
+    def _newton_euler(self, dthetalist, ddthetalist, g, Ftip):
+        """Runs the Newton-Euler recursion with the link adjoints currently
+        stored in the buffer
+        """
+        Vi = self._Vi
+        Vdi = self._Vdi
+        adVi = self._adVi
+        AdTi = self._AdTi
+        Vdi[0, 0: 3] = 0
+        Vdi[0, 3: 6] = -np.asarray(g, dtype=float)
+        for i in range(self.n):
+            Ai = self.Alist[:, i]
+            Vi[i + 1] = np.dot(AdTi[i], Vi[i]) + Ai * dthetalist[i]
+            adVi[i + 1] = np.dot(Vi[i + 1], self._adbasis).reshape(6, 6)
+            Vdi[i + 1] = np.dot(AdTi[i], Vdi[i]) + Ai * ddthetalist[i] \
+                         + np.dot(adVi[i + 1], Ai) * dthetalist[i]
+        Fi = np.array(Ftip, dtype=float)
+        taulist = np.zeros(self.n)
+        for i in range(self.n - 1, -1, -1):
+            Fi = np.dot(AdTi[i + 1].T, Fi) \
+                 + np.dot(self.Glist[i], Vdi[i + 1]) \
+                 - np.dot(adVi[i + 1].T, np.dot(self.Glist[i], Vi[i + 1]))
+            taulist[i] = np.dot(Fi, self.Alist[:, i])
+        return taulist
+
+    def _mass_matrix(self):
+        """Assembles the mass matrix from the link adjoints currently stored
+        in the buffer
+        """
+        return _MassMatrixCRBA(self._AdTi, self.Alist, self.Glist)
+
+    def inverse_dynamics(self, thetalist, dthetalist, ddthetalist, g, Ftip):
+        """Computes inverse dynamics in the space frame
+
+        :param thetalist: n-vector of joint variables
+        :param dthetalist: n-vector of joint rates
+        :param ddthetalist: n-vector of joint accelerations
+        :param g: Gravity vector g
+        :param Ftip: Spatial force applied by the end-effector expressed in
+                     frame {n+1}
+        :return: The n-vector of required joint forces/torques, as
+                 InverseDynamics
+        """
+        self._link_adjoints(thetalist)
+        return self._newton_euler(dthetalist, ddthetalist, g, Ftip)
+
+    def mass_matrix(self, thetalist):
+        """Computes the mass matrix
+
+        :param thetalist: A list of joint variables
+        :return: The numerical inertia matrix M(thetalist), as MassMatrix
+        Uses the composite rigid body algorithm, as MassMatrixCRBA.
+        """
+        self._link_adjoints(thetalist)
+        return self._mass_matrix()
+
+    def forward_dynamics(self, thetalist, dthetalist, taulist, g, Ftip):
+        """Computes forward dynamics in the space frame
+
+        :param thetalist: A list of joint variables
+        :param dthetalist: A list of joint rates
+        :param taulist: An n-vector of joint forces/torques
+        :param g: Gravity vector g
+        :param Ftip: Spatial force applied by the end-effector expressed in
+                     frame {n+1}
+        :return: The resulting joint accelerations, as ForwardDynamics
+        Uses the articulated body algorithm, as ForwardDynamicsABA.
+        """
+        self._link_adjoints(thetalist)
+        return _ForwardDynamicsABA(self._AdTi, self.Alist, self.Glist,
+                                   dthetalist, taulist, g,
+                                   np.asarray(Ftip, dtype=float))
@@ -3,5 +3,8 @@ __init__.py for planning module
 """
 
 from .grasp_planner import GraspPlanner, TrajectoryGenerator, GraspPose
+from .ur5_kinematics import UR5Kinematics
+from .ik_cache import IKCache
 
-__all__ = ['GraspPlanner', 'TrajectoryGenerator', 'GraspPose']
+__all__ = ['GraspPlanner', 'TrajectoryGenerator', 'GraspPose', 'UR5Kinematics',
+           'IKCache']
@@ -6,17 +6,22 @@ Computes grasp poses and generates motion trajectories
 import numpy as np
 import sys
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Iterator
 from dataclasses import dataclass
 
 # Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent / "packages" / "Python"))
+sys.path.append(str(Path(__file__).parent.parent.parent / "packages" / "Python"))
 try:
     import modern_robotics as mr
 except ImportError:
     print("Warning: modern_robotics library not found")
     mr = None
 
+try:
+    from .ur5_kinematics import UR5Kinematics
+except ImportError:
+    from ur5_kinematics import UR5Kinematics
+
 
 @dataclass
 class GraspPose:
@@ -192,6 +197,8 @@ class TrajectoryGenerator:
         
         self.max_vel = self.control_cfg.get('max_velocity', 1.0)
         self.max_acc = self.control_cfg.get('max_acceleration', 2.0)
+        self.blend_time = self.control_cfg.get('blend_time', 0.2)
+        self.kinematics = UR5Kinematics()
     
     def generate_joint_trajectory(self, start_config: List[float],
                                   end_config: List[float],
@@ -231,6 +238,214 @@ class TrajectoryGenerator:
         
         return np.array(trajectory)
     
+    def stream_joint_trajectory(self, start_config: List[float],
+                                end_config: List[float],
+                                duration: float,
+                                timestep: float = 0.01
+                                ) -> Iterator[Tuple[float, np.ndarray,
+                                                    np.ndarray, np.ndarray]]:
+        """
+        Stream a joint trajectory one setpoint per control tick
+        
+        Args:
+            start_config: Starting joint angles (radians)
+            end_config: Ending joint angles (radians)
+            duration: Trajectory duration (seconds)
+            timestep: Time step between setpoints (seconds)
+            
+        Returns:
+            Generator of (time, position, velocity, acceleration) tuples.
+            Stop iterating to preempt the motion, or call
+            send(new_end_config) / send((new_end_config, new_duration)) to
+            re-target it smoothly from the current setpoint.
+        """
+        if mr is None:
+            # Fallback to linear interpolation, without re-targeting
+            trajectory = self._linear_trajectory(start_config, end_config,
+                                                 duration, timestep)
+            velocity = (np.array(end_config) - np.array(start_config)) / duration
+            return ((i * timestep, config, velocity, np.zeros_like(velocity))
+                    for i, config in enumerate(trajectory))
+        
+        # Use Modern Robotics quintic time scaling, evaluated lazily
+        return mr.JointTrajectoryStream(start_config, end_config,
+                                        duration, timestep, method=5)
+    
+    def generate_spline_trajectory(self, waypoints: List[List[float]],
+                                   durations: List[float],
+                                   timestep: float = 0.01,
+                                   order: int = 5) -> np.ndarray:
+        """
+        Generate a smooth joint trajectory through waypoints without stopping
+        at the intermediate ones
+
+        Args:
+            waypoints: Joint configurations to pass through, in order (radians)
+            durations: Time for each segment between consecutive waypoints
+                       (seconds)
+            timestep: Time step for trajectory points (seconds)
+            order: 3 for a cubic spline, 5 for a quintic spline that also
+                   starts and ends at zero acceleration
+
+        Returns:
+            Array of shape (N, num_joints) with trajectory points
+        """
+        waypoints = np.array(waypoints, dtype=float)
+        times = np.r_[0, np.cumsum(durations)]
+        N = int(round(times[-1] / timestep)) + 1
+
+        if mr is None:
+            # Fallback to piecewise linear interpolation
+            t = np.linspace(0, times[-1], N)
+            return np.column_stack([np.interp(t, times, waypoints[:, j])
+                                    for j in range(waypoints.shape[1])])
+
+        return mr.JointSplineTrajectory(waypoints, times, N, order)
+
+    def generate_blended_trajectory(self, waypoints: List[List[float]],
+                                    durations: List[float],
+                                    timestep: float = 0.01,
+                                    blend_time: Optional[float] = None
+                                    ) -> np.ndarray:
+        """
+        Generate a joint trajectory along straight segments between
+        waypoints, rounding each via point with a parabolic blend
+
+        Args:
+            waypoints: Joint configurations to pass, in order (radians)
+            durations: Time for each segment between consecutive waypoints
+                       (seconds)
+            timestep: Time step for trajectory points (seconds)
+            blend_time: Duration of each blend (seconds, > 0), defaults to
+                        the configured blend_time
+
+        Returns:
+            Array of shape (N, num_joints) with trajectory points
+        """
+        waypoints = np.array(waypoints, dtype=float)
+        times = np.r_[0, np.cumsum(durations)]
+        N = int(round(times[-1] / timestep)) + 1
+        if blend_time is None:
+            blend_time = self.blend_time
+        if np.any(np.asarray(blend_time) <= 0):
+            raise ValueError(f"blend_time must be positive, got {blend_time}")
+
+        if mr is None:
+            # Fallback to piecewise linear interpolation without blends
+            t = np.linspace(0, times[-1], N)
+            return np.column_stack([np.interp(t, times, waypoints[:, j])
+                                    for j in range(waypoints.shape[1])])
+
+        return mr.JointTrajectoryBlend(waypoints, times, blend_time, N)
+
+    def generate_blended_cartesian_trajectory(self, poses: List[np.ndarray],
+                                              durations: List[float],
+                                              timestep: float = 0.01,
+                                              blend_time: Optional[float] = None
+                                              ) -> np.ndarray:
+        """
+        Generate a Cartesian trajectory along straight segments between
+        SE(3) poses, rounding each via point with a parabolic blend
+
+        Args:
+            poses: 4x4 transformation matrices to pass, in order
+            durations: Time for each segment between consecutive poses
+                       (seconds)
+            timestep: Time step for trajectory points (seconds)
+            blend_time: Duration of each blend (seconds, > 0), defaults to
+                        the configured blend_time
+
+        Returns:
+            Array of shape (N, 4, 4) with the 4x4 transformation matrices
+        """
+        if blend_time is None:
+            blend_time = self.blend_time
+        if np.any(np.asarray(blend_time) <= 0):
+            raise ValueError(f"blend_time must be positive, got {blend_time}")
+
+        if mr is None:
+            # Fallback to consecutive simple segments without blends
+            trajectory = [poses[0]]
+            for start, end, duration in zip(poses[:-1], poses[1:], durations):
+                trajectory += self._simple_cartesian_trajectory(
+                    start, end, duration, timestep)[1:]
+            return np.array(trajectory)
+
+        times = np.r_[0, np.cumsum(durations)]
+        N = int(round(times[-1] / timestep)) + 1
+        return mr.CartesianTrajectoryBlend(poses, times, blend_time, N)
+
+    def generate_time_optimal_trajectory(self, waypoints: List[List[float]],
+                                         timestep: float = 0.01,
+                                         samples_per_segment: int = 50
+                                         ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Generate the fastest trajectory through joint waypoints that respects
+        the configured velocity and acceleration limits
+
+        Args:
+            waypoints: Joint configurations to pass through, in order (radians)
+            timestep: Time step for trajectory points (seconds)
+            samples_per_segment: Path samples between consecutive waypoints
+
+        Returns:
+            (times, trajectory): times of shape (N,) and trajectory of shape
+            (N, num_joints). The motion comes to rest at every waypoint, since
+            a straight-line path cannot turn a corner at nonzero speed.
+        """
+        waypoints = np.array(waypoints, dtype=float)
+        # Repeated waypoints would give segments with no path to time
+        keep = np.r_[True, np.any(np.diff(waypoints, axis=0) != 0, axis=1)]
+        waypoints = waypoints[keep]
+        if len(waypoints) == 1:
+            return np.zeros(1), waypoints
+        alphas = np.linspace(0, 1, samples_per_segment + 1)[:, None]
+
+        # Time each straight segment between waypoints; the path parameter s
+        # runs from k to k + 1 along segment k
+        s, path, path_times, sdot = [], [], [], []
+        t0 = 0.0
+        for k in range(len(waypoints) - 1):
+            segment = waypoints[k] + alphas * (waypoints[k + 1] - waypoints[k])
+            if mr is None:
+                # Fallback to a constant-velocity timing at the velocity limit
+                duration = np.abs(waypoints[k + 1] - waypoints[k]).max() \
+                    / self.max_vel
+                segment_times = np.linspace(0, duration, len(segment))
+                segment_sdot = np.full(len(segment), 1.0 / duration)
+            else:
+                segment_times, segment_sdot = mr.TimeOptimalTimeScaling(
+                    segment, self.max_vel, self.max_acc
+                )
+            s.append(k + alphas[:-1, 0])
+            path.append(segment[:-1])
+            path_times.append(t0 + segment_times[:-1])
+            sdot.append(segment_sdot[:-1])
+            t0 += segment_times[-1]
+        s.append([len(waypoints) - 1])
+        path.append(waypoints[-1:])
+        path_times.append([t0])
+        sdot.append([0.0])
+        s, path = np.concatenate(s), np.vstack(path)
+        path_times, sdot = np.concatenate(path_times), np.concatenate(sdot)
+        if mr is None:
+            sddot = np.zeros(len(path) - 1)
+        else:
+            sddot = np.diff(sdot ** 2) / (2 * np.diff(s))
+
+        # Resample at the control rate with constant path acceleration
+        # between path samples
+        times = np.arange(0, path_times[-1] + timestep, timestep)
+        times[-1] = min(times[-1], path_times[-1])
+        i = np.clip(np.searchsorted(path_times, times, side='right') - 1,
+                    0, len(path) - 2)
+        tau = times - path_times[i]
+        s_t = np.minimum(s[i] + sdot[i] * tau + 0.5 * sddot[i] * tau ** 2,
+                         s[i + 1])
+        trajectory = np.column_stack([np.interp(s_t, s, path[:, j])
+                                      for j in range(path.shape[1])])
+        return times, trajectory
+
     def _linear_trajectory(self, start: List[float], end: List[float],
                           duration: float, timestep: float) -> np.ndarray:
         """
@@ -261,7 +476,7 @@ class TrajectoryGenerator:
     def generate_cartesian_trajectory(self, start_pose: np.ndarray,
                                      end_pose: np.ndarray,
                                      duration: float,
-                                     timestep: float = 0.01) -> List[np.ndarray]:
+                                     timestep: float = 0.01) -> np.ndarray:
         """
         Generate Cartesian trajectory between two SE(3) poses
         
@@ -272,18 +487,18 @@ class TrajectoryGenerator:
             timestep: Time step
             
         Returns:
-            List of 4x4 transformation matrices
+            Array of shape (N, 4, 4) with the 4x4 transformation matrices
         """
         if mr is None:
             # Simple linear position, SLERP orientation
-            return self._simple_cartesian_trajectory(start_pose, end_pose,
-                                                     duration, timestep)
+            return np.array(self._simple_cartesian_trajectory(
+                start_pose, end_pose, duration, timestep))
         
-        # Use Modern Robotics CartesianTrajectory
+        # Use Modern Robotics CartesianTrajectoryArray (one contiguous array)
         N = int(duration / timestep)
         Tf = duration
         
-        trajectory = mr.CartesianTrajectory(
+        trajectory = mr.CartesianTrajectoryArray(
             Xstart=start_pose,
             Xend=end_pose,
             Tf=Tf,
@@ -293,6 +508,76 @@ class TrajectoryGenerator:
         
         return trajectory
     
+    def stream_cartesian_trajectory(self, start_pose: np.ndarray,
+                                    end_pose: np.ndarray,
+                                    duration: float,
+                                    timestep: float = 0.01
+                                    ) -> Iterator[Tuple[float, np.ndarray,
+                                                        np.ndarray, np.ndarray]]:
+        """
+        Stream a Cartesian trajectory one setpoint per control tick
+        
+        Args:
+            start_pose: Starting 4x4 transformation matrix
+            end_pose: Ending 4x4 transformation matrix
+            duration: Trajectory duration
+            timestep: Time step between setpoints
+            
+        Returns:
+            Generator of (time, pose, velocity, acceleration) tuples, where
+            velocity stacks the angular velocity (end-effector frame) and
+            the linear velocity (base frame). Stop iterating to preempt.
+        """
+        if mr is None:
+            trajectory = self._simple_cartesian_trajectory(start_pose, end_pose,
+                                                           duration, timestep)
+            return ((i * timestep, pose, None, None)
+                    for i, pose in enumerate(trajectory))
+        
+        return mr.CartesianTrajectoryStream(start_pose, end_pose,
+                                            duration, timestep, method=5)
+    
+    def cartesian_to_joint_trajectory(self, trajectory: np.ndarray,
+                                      start_config: List[float],
+                                      eomg: float = 1e-3,
+                                      ev: float = 1e-4
+                                      ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert a Cartesian trajectory into UR5 joint commands
+
+        Args:
+            trajectory: Array of shape (N, 4, 4) with end-effector poses,
+                        e.g. from generate_cartesian_trajectory
+            start_config: Current joint angles, used to seed the first pose
+            eomg: Orientation tolerance (radians)
+            ev: Position tolerance (meters)
+
+        Returns:
+            (joint_trajectory, success): joint angles of shape (N, 6) and a
+            boolean array of shape (N,) marking the poses reached
+        """
+        trajectory = np.asarray(trajectory, dtype=float)
+
+        if mr is None:
+            # Fallback to the closed-form solution nearest the previous one
+            joint_trajectory = np.zeros((len(trajectory), 6))
+            success = np.zeros(len(trajectory), dtype=bool)
+            reference = np.array(start_config, dtype=float)
+            for i, pose in enumerate(trajectory):
+                config = self.kinematics.ik_closest(pose, reference)
+                if config is not None:
+                    reference = config
+                    success[i] = True
+                joint_trajectory[i] = reference
+            return joint_trajectory, success
+
+        # Warm-started continuation along the path
+        joint_trajectory, success, _ = mr.CartesianPathToJointPath(
+            self.kinematics.Slist, self.kinematics.M, trajectory,
+            start_config, eomg, ev
+        )
+        return joint_trajectory, success
+
     def _simple_cartesian_trajectory(self, start: np.ndarray, end: np.ndarray,
                                     duration: float, timestep: float) -> List[np.ndarray]:
         """
@@ -0,0 +1,259 @@
+"""
+IK Cache Module
+Warm-start cache of solved (pose -> joint angles) pairs for repetitive tasks
+"""
+
+import numpy as np
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent / "packages" / "Python"))
+try:
+    import modern_robotics as mr
+except ImportError:
+    print("Warning: modern_robotics library not found")
+    mr = None
+
+
+class IKCache:
+    """Seed numeric IK with the nearest previously solved pose"""
+
+    def __init__(self, Slist: np.ndarray, M: np.ndarray,
+                 max_size: int = 1024,
+                 voxel_size: float = 0.05,
+                 orientation_weight: float = 0.1,
+                 eomg: float = 1e-3,
+                 ev: float = 1e-4,
+                 maxiterations: int = 20):
+        """
+        Initialize IK cache
+
+        Args:
+            Slist: Joint screw axes in the space frame (6 x n)
+            M: Home configuration of the end-effector (4x4)
+            max_size: Maximum number of stored solutions (LRU eviction)
+            voxel_size: Edge length of the position grid cells (meters)
+            orientation_weight: Meters of position error equivalent to one
+                                radian of orientation error when ranking
+                                stored poses
+            eomg: Orientation tolerance, also used to find exact hit
+                  candidates (radians)
+            ev: Position tolerance, also used to find exact hit candidates
+                (meters)
+            maxiterations: Iteration limit for seeded IK solves
+        """
+        self.Slist = np.asarray(Slist, dtype=float)
+        self.M = np.asarray(M, dtype=float)
+        self.max_size = max_size
+        self.voxel_size = voxel_size
+        self.orientation_weight = orientation_weight
+        self.eomg = eomg
+        self.ev = ev
+        self.maxiterations = maxiterations
+
+        # entry id -> (T, thetalist, voxel), oldest first
+        self._entries = OrderedDict()
+        # voxel -> entry ids whose position falls in that cell
+        self._grid: Dict[Tuple[int, int, int], List[int]] = {}
+        self._next_id = 0
+
+        self.stats = {'hits': 0, 'seeded': 0, 'misses': 0, 'iterations': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _voxel(self, p: np.ndarray) -> Tuple[int, int, int]:
+        """Grid cell containing position p"""
+        return tuple(np.floor(p / self.voxel_size).astype(int))
+
+    def lookup(self, T: np.ndarray) -> Tuple[Optional[np.ndarray], bool]:
+        """
+        Find the stored solution whose pose is nearest to T
+
+        Only the 27 grid cells around T are searched, so poses more than one
+        voxel away are never returned.
+
+        Args:
+            T: Desired 4x4 end-effector pose
+
+        Returns:
+            (thetalist, exact): the stored joint angles or None, and whether
+            the stored pose matches T within (eomg, ev)
+        """
+        T = np.asarray(T, dtype=float)
+        p = T[:3, 3]
+        R = T[:3, :3]
+        cx, cy, cz = self._voxel(p)
+
+        best_id = None
+        best_cost = np.inf
+        best_errors = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for entry_id in self._grid.get((cx + dx, cy + dy, cz + dz), ()):
+                        Tc = self._entries[entry_id][0]
+                        perr = np.linalg.norm(Tc[:3, 3] - p)
+                        cos_angle = (np.trace(np.dot(Tc[:3, :3].T, R)) - 1) / 2
+                        oerr = np.arccos(np.clip(cos_angle, -1.0, 1.0))
+                        cost = perr + self.orientation_weight * oerr
+                        if cost < best_cost:
+                            best_id, best_cost = entry_id, cost
+                            best_errors = (oerr, perr)
+
+        if best_id is None:
+            return None, False
+        self._entries.move_to_end(best_id)
+        exact = best_errors[0] <= self.eomg and best_errors[1] <= self.ev
+        return self._entries[best_id][1].copy(), exact
+
+    def insert(self, T: np.ndarray, thetalist: np.ndarray):
+        """
+        Store a solved pose, evicting the least recently used entry if full
+
+        Args:
+            T: 4x4 end-effector pose
+            thetalist: Joint angles that achieve T
+        """
+        T = np.array(T, dtype=float)
+        voxel = self._voxel(T[:3, 3])
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (T, np.array(thetalist, dtype=float), voxel)
+        self._grid.setdefault(voxel, []).append(entry_id)
+
+        while len(self._entries) > self.max_size:
+            old_id, (_, _, old_voxel) = self._entries.popitem(last=False)
+            cell = self._grid[old_voxel]
+            cell.remove(old_id)
+            if not cell:
+                del self._grid[old_voxel]
+
+    def _within_tolerance(self, thetalist: np.ndarray, T: np.ndarray) -> bool:
+        """Whether FK of thetalist reaches T within (eomg, ev), measured
+        with the same space twist error as IKinSpaceLM"""
+        Tsb = mr.FKinSpace(self.M, self.Slist, thetalist)
+        Vs = np.dot(mr.Adjoint(Tsb),
+                    mr.se3ToVec(mr.MatrixLog6(np.dot(mr.TransInv(Tsb), T))))
+        return (np.linalg.norm(Vs[:3]) <= self.eomg
+                and np.linalg.norm(Vs[3:]) <= self.ev)
+
+    def solve(self, T: np.ndarray,
+              thetalist0: Optional[np.ndarray] = None) -> Tuple[np.ndarray, bool]:
+        """
+        Solve IK for T, using the cache for an exact hit or a warm start
+
+        A stored pose within (eomg, ev) of T is only a candidate: its joint
+        angles solve the stored pose within tolerance, so they may miss T by
+        up to twice the tolerance. The candidate counts as a hit only if FK
+        of its joint angles reaches T within (eomg, ev); otherwise it seeds
+        the IK solve like any other nearby entry.
+
+        Args:
+            T: Desired 4x4 end-effector pose
+            thetalist0: Fallback initial guess when the cache has no nearby
+                        entry (defaults to zeros)
+
+        Returns:
+            (thetalist, success); success is always False without
+            modern_robotics, since the result cannot be checked
+        """
+        T = np.asarray(T, dtype=float)
+        seed, exact = self.lookup(T)
+        if thetalist0 is None:
+            thetalist0 = np.zeros(self.Slist.shape[1])
+
+        if mr is None:
+            # Without FK a cached solution cannot be verified and without
+            # IKinSpaceLM it cannot be refined: return the best guess only
+            self.stats['misses'] += 1
+            if seed is None:
+                seed = np.asarray(thetalist0, dtype=float)
+            return seed, False
+
+        if exact and self._within_tolerance(seed, T):
+            self.stats['hits'] += 1
+            return seed, True
+        if seed is not None:
+            self.stats['seeded'] += 1
+        else:
+            self.stats['misses'] += 1
+            seed = np.asarray(thetalist0, dtype=float)
+
+        thetalist, success, info = mr.IKinSpaceLM(
+            self.Slist, self.M, T, seed, self.eomg, self.ev,
+            maxiterations=self.maxiterations
+        )
+        self.stats['iterations'] += info['iterations']
+        if success:
+            self.insert(T, thetalist)
+        return thetalist, success
+
+    def clear(self):
+        """Remove all stored solutions and reset statistics"""
+        self._entries.clear()
+        self._grid.clear()
+        for key in self.stats:
+            self.stats[key] = 0
+
+
+def test_ik_cache():
+    """Test the IK cache on a repetitive pick-and-place workload"""
+    try:
+        from .ur5_kinematics import UR5Kinematics
+    except ImportError:
+        from ur5_kinematics import UR5Kinematics
+
+    kin = UR5Kinematics()
+    cache = IKCache(kin.Slist, kin.M, max_size=256)
+    rng = np.random.default_rng(0)
+
+    # Top-down grasps over a few bins with small position jitter
+    R_down = np.array([[1, 0, 0], [0, -1, 0], [0, 0, -1]], dtype=float)
+    bins = np.array([[0.35, -0.3, 0.1], [0.35, 0.0, 0.1], [0.35, 0.3, 0.1],
+                     [0.0, 0.4, 0.15]])
+    thetalist0 = kin.ik_closest(
+        np.r_[np.c_[R_down, bins[1]], [[0, 0, 0, 1]]], np.zeros(6)
+    )
+
+    n_calls = 400
+    n_success = 0
+    for i in range(n_calls):
+        T = np.eye(4)
+        T[:3, :3] = R_down
+        T[:3, 3] = bins[rng.integers(len(bins))] + rng.normal(0, 0.005, 3)
+        if rng.random() < 0.3:
+            T[:3, 3] = np.round(T[:3, 3], 2)  # repeated exact targets
+        thetalist, success = cache.solve(T, thetalist0)
+        assert success, f"call {i} failed"
+        assert cache._within_tolerance(thetalist, T), \
+            f"call {i} returned a solution outside (eomg, ev)"
+        n_success += success
+
+    stats = cache.stats
+    solves = stats['seeded'] + stats['misses']
+    print(f"\n✓ {n_success}/{n_calls} targets solved, {len(cache)} cached")
+    print(f"  Exact hits: {stats['hits']}, seeded: {stats['seeded']}, "
+          f"misses: {stats['misses']}")
+    print(f"  Mean iterations per solve: {stats['iterations'] / max(solves, 1):.2f}")
+
+    # The stored solution is only within tolerance of the stored pose: a query
+    # on the other side of the stored pose must be re-solved, not served
+    cache = IKCache(kin.Slist, kin.M, eomg=1e-3, ev=1e-3)
+    T = np.r_[np.c_[R_down, bins[0]], [[0, 0, 0, 1]]]
+    T_solved = T.copy()
+    T_solved[0, 3] -= 0.9e-3
+    cache.insert(T, kin.ik_closest(T_solved, thetalist0))
+    T_query = T.copy()
+    T_query[0, 3] += 0.9e-3
+    thetalist, success = cache.solve(T_query, thetalist0)
+    assert success and cache._within_tolerance(thetalist, T_query)
+    assert cache.stats['hits'] == 0 and cache.stats['seeded'] == 1
+    print("✓ Near-tolerance cache entry re-solved instead of served as a hit")
+
+
+if __name__ == "__main__":
+    test_ik_cache()
@@ -0,0 +1,257 @@
+"""
+UR5 Kinematics Module
+Closed-form inverse kinematics for the UR5 in Modern Robotics conventions
+"""
+
+import numpy as np
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent / "packages" / "Python"))
+try:
+    import modern_robotics as mr
+except ImportError:
+    print("Warning: modern_robotics library not found")
+    mr = None
+
+
+# UR5 link dimensions (meters), Modern Robotics Example 4.5
+UR5_W1 = 0.109
+UR5_W2 = 0.082
+UR5_L1 = 0.425
+UR5_L2 = 0.392
+UR5_H1 = 0.089
+UR5_H2 = 0.095
+
+
+class UR5Kinematics:
+    """Forward and closed-form inverse kinematics for a UR5 arm"""
+
+    def __init__(self, W1: float = UR5_W1, W2: float = UR5_W2,
+                 L1: float = UR5_L1, L2: float = UR5_L2,
+                 H1: float = UR5_H1, H2: float = UR5_H2):
+        """
+        Initialize UR5 kinematics
+
+        Args:
+            W1, W2, L1, L2, H1, H2: Link dimensions in meters
+
+        The zero configuration and joint screw axes follow Modern Robotics
+        Example 4.5: arm stretched out along +x, tool z-axis along +y.
+        """
+        self.W1, self.W2 = W1, W2
+        self.L1, self.L2 = L1, L2
+        self.H1, self.H2 = H1, H2
+
+        # Home configuration of the end-effector
+        self.M = np.array([[-1, 0, 0, L1 + L2],
+                           [0, 0, 1, W1 + W2],
+                           [0, 1, 0, H1 - H2],
+                           [0, 0, 0, 1]], dtype=float)
+
+        # Joint screw axes in the space frame (as columns)
+        self.Slist = np.array([[0, 0, 1, 0, 0, 0],
+                               [0, 1, 0, -H1, 0, 0],
+                               [0, 1, 0, -H1, 0, L1],
+                               [0, 1, 0, -H1, 0, L1 + L2],
+                               [0, 0, -1, -W1, L1 + L2, 0],
+                               [0, 1, 0, H2 - H1, 0, L1 + L2]],
+                              dtype=float).T
+
+    def fk(self, thetalist: np.ndarray) -> np.ndarray:
+        """
+        Compute end-effector pose
+
+        Args:
+            thetalist: Joint angles (6,) or (N, 6) in radians
+
+        Returns:
+            4x4 transformation matrix, or (N, 4, 4) for batched input
+        """
+        thetalist = np.asarray(thetalist, dtype=float)
+        if thetalist.ndim == 2:
+            return mr.FKinSpaceBatch(self.M, self.Slist, thetalist)
+        return mr.FKinSpace(self.M, self.Slist, thetalist)
+
+    def ik(self, T: np.ndarray) -> np.ndarray:
+        """
+        Compute all inverse kinematics solutions for one pose
+
+        Args:
+            T: Desired 4x4 end-effector pose in the base frame
+
+        Returns:
+            Array of shape (k, 6) with the k <= 8 real solutions, angles
+            wrapped to (-pi, pi]. Empty if the pose is out of reach.
+        """
+        solutions, valid = self.ik_batch(np.asarray(T, dtype=float)[None])
+        return solutions[0][valid[0]]
+
+    def ik_closest(self, T: np.ndarray,
+                   reference: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Compute the inverse kinematics solution closest to a reference
+
+        Args:
+            T: Desired 4x4 end-effector pose in the base frame
+            reference: Joint angles to stay close to (e.g. current state)
+
+        Returns:
+            Joint angles (6,) unwrapped to lie within pi of the reference,
+            or None if the pose is out of reach
+        """
+        solutions = self.ik(T)
+        if len(solutions) == 0:
+            return None
+        reference = np.asarray(reference, dtype=float)
+        solutions = reference + _wrap(solutions - reference)
+        distances = np.linalg.norm(solutions - reference, axis=1)
+        return solutions[np.argmin(distances)]
+
+    def ik_batch(self, Ts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute all inverse kinematics solutions for many poses at once
+
+        Args:
+            Ts: Desired end-effector poses, shape (N, 4, 4)
+
+        Returns:
+            solutions: Array of shape (N, 8, 6) with joint angles in (-pi, pi]
+            valid: Boolean array of shape (N, 8), False where a branch has
+                   no real solution (target out of reach)
+
+        Branches are ordered (shoulder, wrist, elbow) with the elbow varying
+        fastest. At a wrist singularity (sin(theta5) = 0) only theta4 + theta6
+        is determined; theta6 is then set to zero.
+        """
+        Ts = np.asarray(Ts, dtype=float)
+        N = Ts.shape[0]
+        R = Ts[:, :3, :3]
+        p = Ts[:, :3, 3]
+
+        # Wrist center: on both the joint 5 and joint 6 axes
+        pw = p - self.W2 * R[:, :, 2]
+
+        # Shoulder (theta1): the wrist center lies W1 off the arm plane
+        r = np.hypot(pw[:, 0], pw[:, 1])
+        phi = np.arctan2(pw[:, 1], pw[:, 0])
+        reach1 = r >= self.W1
+        alpha = np.arcsin(np.clip(self.W1 / np.maximum(r, 1e-12), -1.0, 1.0))
+        theta1 = np.stack([phi - alpha, phi - np.pi + alpha], axis=1)  # (N, 2)
+        c1, s1 = np.cos(theta1), np.sin(theta1)
+
+        # Rotation and wrist center in the frame turned by -theta1
+        Rz1T = np.zeros((N, 2, 3, 3))
+        Rz1T[..., 0, 0] = c1
+        Rz1T[..., 0, 1] = s1
+        Rz1T[..., 1, 0] = -s1
+        Rz1T[..., 1, 1] = c1
+        Rz1T[..., 2, 2] = 1.0
+        Rp = np.matmul(Rz1T, R[:, None])                     # (N, 2, 3, 3)
+        pwp = np.einsum('nkij,nj->nki', Rz1T, pw)            # (N, 2, 3)
+
+        # Wrist (theta5, theta6): row y of Rp is (s5 c6, -s5 s6, c5)
+        t5 = np.arccos(np.clip(Rp[..., 1, 2], -1.0, 1.0))
+        theta5 = np.stack([t5, -t5], axis=2)                 # (N, 2, 2)
+        s5 = np.sin(theta5)
+        c5 = np.cos(theta5)
+        singular = np.abs(s5) < 1e-10
+        s5safe = np.where(singular, 1.0, s5)
+        theta6 = np.arctan2(-Rp[..., None, 1, 1] / s5safe,
+                            Rp[..., None, 1, 0] / s5safe)
+        theta6 = np.where(singular, 0.0, theta6)
+        c6, s6 = np.cos(theta6), np.sin(theta6)
+
+        # theta2 + theta3 + theta4 from Ry(t234) = Rp M^T Ry(t6)^T Rz(-t5)^T
+        A = np.matmul(Rp, self.M[:3, :3].T)[:, :, None]      # (N, 2, 1, 3, 3)
+        # Row x of A Ry(t6)^T Rz(-t5)^T, which gives (c234, ., s234)
+        b0 = A[..., 0, 0] * c6 + A[..., 0, 2] * s6
+        b1 = A[..., 0, 1]
+        c234 = b0 * c5 + b1 * s5
+        s234 = A[..., 0, 2] * c6 - A[..., 0, 0] * s6
+        theta234 = np.arctan2(s234, c234)                    # (N, 2, 2)
+
+        # Elbow (theta2, theta3): planar 2R to the joint 4 axis
+        u = pwp[:, :, None, 0] + self.H2 * s234
+        w = -(pwp[:, :, None, 2] + self.H2 * c234 - self.H1)
+        c3 = (u ** 2 + w ** 2 - self.L1 ** 2 - self.L2 ** 2) \
+            / (2 * self.L1 * self.L2)
+        reach3 = np.abs(c3) <= 1.0 + 1e-9
+        t3 = np.arccos(np.clip(c3, -1.0, 1.0))
+        theta3 = np.stack([t3, -t3], axis=3)                 # (N, 2, 2, 2)
+        theta2 = np.arctan2(w, u)[..., None] \
+            - np.arctan2(self.L2 * np.sin(theta3),
+                         self.L1 + self.L2 * np.cos(theta3))
+        theta4 = theta234[..., None] - theta2 - theta3
+
+        shape = (N, 2, 2, 2)
+        solutions = np.stack([np.broadcast_to(theta1[:, :, None, None], shape),
+                              theta2,
+                              theta3,
+                              theta4,
+                              np.broadcast_to(theta5[..., None], shape),
+                              np.broadcast_to(theta6[..., None], shape)],
+                             axis=-1)
+        valid = reach1[:, None, None, None] & np.broadcast_to(
+            reach3[..., None], shape)
+        return _wrap(solutions.reshape(N, 8, 6)), valid.reshape(N, 8)
+
+
+def _wrap(angles: np.ndarray) -> np.ndarray:
+    """Wrap angles to (-pi, pi]"""
+    return np.pi - np.mod(np.pi - angles, 2 * np.pi)
+
+
+def test_ur5_kinematics():
+    """Test UR5 closed-form IK by FKinSpace round trips"""
+    kin = UR5Kinematics()
+    rng = np.random.default_rng(0)
+
+    # Single pose: every returned solution must reproduce the target
+    thetalist = rng.uniform(-np.pi, np.pi, 6)
+    T = mr.FKinSpace(kin.M, kin.Slist, thetalist)
+    solutions = kin.ik(T)
+    errors = [np.abs(mr.FKinSpace(kin.M, kin.Slist, q) - T).max()
+              for q in solutions]
+    assert len(solutions) > 0
+    assert max(errors) < 1e-9, f"FK round trip error {max(errors):.2e}"
+    assert np.abs(_wrap(solutions - thetalist)).max(axis=1).min() < 1e-9, \
+        "true configuration missing from the IK solutions"
+    print(f"\n✓ {len(solutions)} solutions, max FK error {max(errors):.2e}")
+    closest = kin.ik_closest(T, thetalist)
+    assert np.abs(_wrap(closest - thetalist)).max() < 1e-9
+    print(f"  Closest to ground truth: {np.abs(closest - thetalist).max():.2e}")
+
+    # Batched round trip
+    N = 2000
+    thetamat = rng.uniform(-np.pi, np.pi, (N, 6))
+    Ts = kin.fk(thetamat)
+    start = time.time()
+    solutions, valid = kin.ik_batch(Ts)
+    elapsed = time.time() - start
+    Tsol = kin.fk(solutions[valid])
+    Tref = np.repeat(Ts, 8, axis=0)[valid.ravel()]
+    assert np.abs(Tsol - Tref).max() < 1e-9, \
+        f"batch FK round trip error {np.abs(Tsol - Tref).max():.2e}"
+    # Every pose must have its ground-truth configuration among its solutions
+    distances = np.abs(_wrap(solutions - thetamat[:, None, :])).max(axis=2)
+    found = np.where(valid, distances, np.inf).min(axis=1) < 1e-9
+    assert found.all(), f"{(~found).sum()} poses miss the true configuration"
+    print(f"✓ Batch of {N}: {valid.sum()} solutions in {elapsed * 1e3:.1f} ms"
+          f" ({elapsed / N * 1e6:.1f} us/pose)")
+    print(f"  Max FK error: {np.abs(Tsol - Tref).max():.2e}")
+
+    # Out of reach
+    T_far = np.eye(4)
+    T_far[0, 3] = 2.0
+    assert len(kin.ik(T_far)) == 0
+    assert not kin.ik_batch(T_far[None])[1].any()
+    assert kin.ik_closest(T_far, np.zeros(6)) is None
+    print(f"✓ Unreachable pose: {len(kin.ik(T_far))} solutions")
+
+
+if __name__ == "__main__":
+    test_ur5_kinematics()
@@ -0,0 +1,138 @@
+"""
+Check MassMatrixCRBA against the Newton-Euler MassMatrix, and the dynamics
+that were switched over to it against their original formulation
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "packages" / "Python"))
+import modern_robotics as mr
+
+
+def three_link_robot():
+    """The 3-link robot used in the core.py docstring examples"""
+    M01 = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0.089159],
+                    [0, 0, 0, 1]])
+    M12 = np.array([[0, 0, 1, 0.28], [0, 1, 0, 0.13585], [-1, 0, 0, 0],
+                    [0, 0, 0, 1]])
+    M23 = np.array([[1, 0, 0, 0], [0, 1, 0, -0.1197], [0, 0, 1, 0.395],
+                    [0, 0, 0, 1]])
+    M34 = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0.14225],
+                    [0, 0, 0, 1]])
+    G1 = np.diag([0.010267, 0.010267, 0.00666, 3.7, 3.7, 3.7])
+    G2 = np.diag([0.22689, 0.22689, 0.0151074, 8.393, 8.393, 8.393])
+    G3 = np.diag([0.0494433, 0.0494433, 0.004095, 2.275, 2.275, 2.275])
+    Mlist = np.array([M01, M12, M23, M34])
+    Glist = np.array([G1, G2, G3])
+    Slist = np.array([[1, 0, 1, 0, 1, 0],
+                      [0, 1, 0, -0.089, 0, 0],
+                      [0, 1, 0, -0.089, 0, 0.425]]).T
+    return Mlist, Glist, Slist
+
+
+def random_chain(n, rng):
+    """Random n-joint chain with a prismatic third joint and full inertias"""
+    Mlist = []
+    for _ in range(n + 1):
+        R = mr.MatrixExp3(mr.VecToso3(rng.normal(size=3)))
+        Mlist.append(mr.RpToTrans(R, 0.3 * rng.normal(size=3)))
+    Mi = np.eye(4)
+    Slist = []
+    Glist = []
+    for i in range(n):
+        Mi = np.dot(Mi, Mlist[i])
+        w = rng.normal(size=3)
+        w = w / np.linalg.norm(w)
+        if i == 2:
+            A = np.r_[0, 0, 0, w]
+        else:
+            A = np.r_[w, np.cross(-w, 0.1 * rng.normal(size=3))]
+        Slist.append(np.dot(mr.Adjoint(Mi), A))
+        # Rotated, off-centre inertia so that the off-diagonal blocks of Gi
+        # are exercised as well
+        R = mr.MatrixExp3(mr.VecToso3(rng.normal(size=3)))
+        Gb = np.diag(np.r_[rng.uniform(0.01, 0.1, 3),
+                           np.ones(3) * rng.uniform(1, 5)])
+        AdT = mr.Adjoint(mr.RpToTrans(R, 0.05 * rng.normal(size=3)))
+        Glist.append(np.dot(np.dot(AdT.T, Gb), AdT))
+    return np.array(Mlist), np.array(Glist), np.array(Slist).T
+
+
+def forward_dynamics_reference(thetalist, dthetalist, taulist, g, Ftip,
+                               Mlist, Glist, Slist):
+    """ForwardDynamics as written before it was switched to MassMatrixCRBA"""
+    return np.linalg.solve(
+        mr.MassMatrix(thetalist, Mlist, Glist, Slist),
+        np.array(taulist)
+        - mr.VelQuadraticForces(thetalist, dthetalist, Mlist, Glist, Slist)
+        - mr.GravityForces(thetalist, g, Mlist, Glist, Slist)
+        - mr.EndEffectorForces(thetalist, Ftip, Mlist, Glist, Slist))
+
+
+def test_mass_matrix_crba():
+    """Compare the CRBA mass matrix and the rerouted dynamics to Newton-Euler"""
+    rng = np.random.default_rng(0)
+    g = np.array([0, 0, -9.8])
+
+    # Docstring example
+    Mlist, Glist, Slist = three_link_robot()
+    thetalist = np.array([0.1, 0.1, 0.1])
+    Mcrba = mr.MassMatrixCRBA(thetalist, Mlist, Glist, Slist)
+    assert np.allclose(Mcrba, mr.MassMatrix(thetalist, Mlist, Glist, Slist))
+    assert np.allclose(Mcrba, [[2.25433380e+01, -3.07146754e-01, -7.18426391e-03],
+                               [-3.07146754e-01, 1.96850717e+00, 4.32157368e-01],
+                               [-7.18426391e-03, 4.32157368e-01, 1.91630858e-01]])
+    assert np.allclose(
+        mr.ForwardDynamics(thetalist, [0.1, 0.2, 0.3], [0.5, 0.6, 0.7], g,
+                           np.ones(6), Mlist, Glist, Slist),
+        [-0.97392907, 25.58466784, -32.91499212])
+    print("✓ 3-link docstring example matches MassMatrix")
+
+    # Random 6-joint chains at random states
+    n_checks = 0
+    for _ in range(5):
+        Mlist, Glist, Slist = random_chain(6, rng)
+        M = np.linalg.multi_dot(list(Mlist))
+        robot = mr.RobotModel(M, Slist, Mlist, Glist)
+        for _ in range(10):
+            thetalist = rng.uniform(-np.pi, np.pi, 6)
+            dthetalist = rng.normal(size=6)
+            taulist = rng.normal(size=6)
+            Ftip = rng.normal(size=6)
+            Mref = mr.MassMatrix(thetalist, Mlist, Glist, Slist)
+            assert np.allclose(
+                mr.MassMatrixCRBA(thetalist, Mlist, Glist, Slist), Mref)
+            assert np.allclose(robot.mass_matrix(thetalist), Mref)
+
+            ddthetalist = forward_dynamics_reference(
+                thetalist, dthetalist, taulist, g, Ftip, Mlist, Glist, Slist)
+            assert np.allclose(
+                mr.ForwardDynamics(thetalist, dthetalist, taulist, g, Ftip,
+                                   Mlist, Glist, Slist), ddthetalist)
+
+            # ComputedTorque: M(theta) times the feedback term plus the
+            # Newton-Euler feedforward
+            thetalistd = thetalist + 0.1 * rng.normal(size=6)
+            dthetalistd = rng.normal(size=6)
+            ddthetalistd = rng.normal(size=6)
+            eint = rng.normal(size=6)
+            Kp, Ki, Kd = 1.3, 1.2, 1.1
+            e = thetalistd - thetalist
+            tau_ref = np.dot(Mref, Kp * e + Ki * (eint + e)
+                             + Kd * (dthetalistd - dthetalist)) \
+                + mr.InverseDynamics(thetalist, dthetalist, ddthetalistd, g,
+                                     np.zeros(6), Mlist, Glist, Slist)
+            assert np.allclose(
+                mr.ComputedTorque(thetalist, dthetalist, eint, g, Mlist,
+                                  Glist, Slist, thetalistd, dthetalistd,
+                                  ddthetalistd, Kp, Ki, Kd), tau_ref)
+            n_checks += 1
+    print(f"✓ {n_checks} random 6-joint states match MassMatrix, "
+          f"ForwardDynamics and ComputedTorque references")
+
+
+if __name__ == "__main__":
+    test_mass_matrix_crba()